@@ -1,12 +1,24 @@
-from datetime import datetime, timedelta, timezone
+import asyncio
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import lru_cache
+from typing import Optional
 
 import jwt
+import orjson
 from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, field_validator, model_validator
 
 import app.storage as storage
-from app.auth.handlers import AuthedUser
-from app.auth.passwords import hash_password, validate_password, verify_password
+from app.auth.handlers import AuthedUser, purge_user, tokens_revoked
+from app.auth.passwords import (
+    ahash_password,
+    averify_password,
+    hash_password,
+    needs_rehash,
+    validate_password,
+)
+from app.auth.rate_limit import SlidingWindowLimiter
 from app.auth.settings import AuthType, settings
 from app.memory import clear_user_memory
 from app.schema import User
@@ -15,34 +27,100 @@ router = APIRouter()
 
 REFRESH_COOKIE_NAME = "opengpts_refresh"
 
+_ACCESS_TTL_SECONDS = settings.access_token_ttl_minutes * 60
+_REFRESH_TTL_SECONDS = settings.refresh_token_ttl_days * 86_400
+
+# Verified against when no stored hash exists, so a miss takes as long as a
+# real password check and does not reveal whether the user exists.
+_DUMMY_HASH = hash_password("a_constant_string_for_timing_equalization")
+
+# Applied before any storage or password work in /login, /signup and /refresh.
+_auth_limiter = SlidingWindowLimiter(
+    settings.auth_rate_limit, settings.auth_rate_limit_window_seconds
+)
+
+
+def _client_host(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+
+def _b64url(data: bytes) -> bytes:
+    return urlsafe_b64encode(data).rstrip(b"=")
+
+
+@lru_cache(maxsize=4)
+def _jws_header_segment(alg: str) -> bytes:
+    return _b64url(orjson.dumps({"alg": alg, "typ": "JWT"}))
+
+
+def _encode_token(claims: dict) -> str:
+    """
+    Sign claims into a JWT. HS* tokens are assembled directly from a cached
+    header segment and a copy of the keyed HMAC; other algorithms go through
+    PyJWT with the pre-parsed key.
+    """
+    jwt_local = settings.jwt_local
+    signer = jwt_local.hmac_signer
+    if signer is None:
+        return jwt.encode(claims, jwt_local.signing_key, algorithm=jwt_local.alg_upper)
+    signing_input = (
+        _jws_header_segment(jwt_local.alg_upper) + b"." + _b64url(orjson.dumps(claims))
+    )
+    mac = signer.copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + _b64url(mac.digest())).decode("ascii")
+
 
 def _issue_access_token(sub: str) -> str:
-    now = datetime.now(timezone.utc)
-    return jwt.encode(
+    return _encode_token(
         {
+            **settings.jwt_local.access_claims,
             "sub": sub,
-            "iss": settings.jwt_local.iss,
-            "aud": settings.jwt_local.aud,
-            "token_use": "access",
-            "exp": now + timedelta(minutes=settings.access_token_ttl_minutes),
-        },
-        settings.jwt_local.decode_key,
-        algorithm=settings.jwt_local.alg.upper(),
+            # Fractional, so tokens issued just after a logout are not revoked.
+            "iat": time.time(),
+            "exp": int(time.time()) + _ACCESS_TTL_SECONDS,
+        }
     )
 
 
 def _issue_refresh_token(sub: str) -> str:
-    now = datetime.now(timezone.utc)
-    return jwt.encode(
+    return _encode_token(
         {
+            **settings.jwt_local.refresh_claims,
             "sub": sub,
-            "iss": settings.jwt_local.iss,
-            "aud": settings.jwt_local.aud,
-            "token_use": "refresh",
-            "exp": now + timedelta(days=settings.refresh_token_ttl_days),
-        },
-        settings.jwt_local.decode_key,
-        algorithm=settings.jwt_local.alg.upper(),
+            "iat": time.time(),
+            "exp": int(time.time()) + _REFRESH_TTL_SECONDS,
+        }
+    )
+
+
+def _check_token_shape(token: str) -> None:
+    """
+    Cheaply reject tokens that cannot be ours before paying for signature
+    verification: three segments and a header naming the configured alg.
+    """
+    parts = token.split(".")
+    if len(parts) != 3:
+        raise jwt.DecodeError("Not enough segments")
+    header_segment = parts[0] + "=" * (-len(parts[0]) % 4)
+    try:
+        header = orjson.loads(urlsafe_b64decode(header_segment))
+    except ValueError:
+        raise jwt.DecodeError("Invalid header")
+    alg = header.get("alg") if isinstance(header, dict) else None
+    if alg != settings.jwt_local.alg_upper:
+        raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+
+
+def _decode_refresh_token(refresh_token: str) -> dict:
+    _check_token_shape(refresh_token)
+    return jwt.decode(
+        refresh_token,
+        settings.jwt_local.verify_key,
+        issuer=settings.jwt_local.iss,
+        audience=settings.jwt_local.aud,
+        algorithms=[settings.jwt_local.alg_upper],
+        options={"require": ["exp", "iss", "aud", "sub", "token_use"]},
     )
 
 
@@ -170,12 +248,17 @@ async def login(
             status_code=400, detail="AUTH_TYPE must be jwt_local to use /login."
         )
 
+    _auth_limiter.check(_client_host(request), "login", payload.username)
     sub = payload.username
     record = await storage.get_user_by_sub(sub)
     if not record or not record.get("password_hash"):
+        await averify_password(payload.password, _DUMMY_HASH)
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    if not verify_password(payload.password, record["password_hash"]):
+    if not await averify_password(payload.password, record["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if needs_rehash(record["password_hash"]):
+        password_hash = await ahash_password(payload.password)
+        await storage.set_user_password(record["user_id"], password_hash)
     user = User(**record)
     access_token = _issue_access_token(sub)
     refresh_token = _issue_refresh_token(sub)
@@ -192,9 +275,10 @@ async def signup(
             status_code=400, detail="AUTH_TYPE must be jwt_local to use /signup."
         )
 
+    _auth_limiter.check(_client_host(request), "signup", payload.username)
     sub = payload.username
     record = await storage.get_user_by_sub(sub)
-    password_hash = hash_password(payload.password)
+    password_hash = await ahash_password(payload.password)
     if record:
         if record.get("password_hash"):
             raise HTTPException(status_code=409, detail="User already exists")
@@ -215,19 +299,13 @@ async def refresh(request: Request, response: Response) -> TokenResponse:
             status_code=400, detail="AUTH_TYPE must be jwt_local to use /refresh."
         )
 
+    _auth_limiter.check(_client_host(request), "refresh")
     refresh_token = request.cookies.get(REFRESH_COOKIE_NAME)
     if not refresh_token:
         raise HTTPException(status_code=401, detail="Missing refresh token")
 
     try:
-        payload = jwt.decode(
-            refresh_token,
-            settings.jwt_local.decode_key,
-            issuer=settings.jwt_local.iss,
-            audience=settings.jwt_local.aud,
-            algorithms=[settings.jwt_local.alg.upper()],
-            options={"require": ["exp", "iss", "aud", "sub", "token_use"]},
-        )
+        payload = _decode_refresh_token(refresh_token)
     except jwt.PyJWTError as exc:
         raise HTTPException(status_code=401, detail=str(exc))
 
@@ -235,10 +313,9 @@ async def refresh(request: Request, response: Response) -> TokenResponse:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
     sub = payload["sub"]
-    record = await storage.get_user_by_sub(sub)
-    if not record:
+    user = await storage.get_user_by_sub_light(sub)
+    if not user or tokens_revoked(payload, user):
         raise HTTPException(status_code=401, detail="Invalid refresh token")
-    user = User(**record)
 
     access_token = _issue_access_token(sub)
     new_refresh_token = _issue_refresh_token(sub)
@@ -248,6 +325,16 @@ async def refresh(request: Request, response: Response) -> TokenResponse:
 
 @router.post("/logout")
 async def logout(request: Request, response: Response) -> dict:
+    refresh_token = request.cookies.get(REFRESH_COOKIE_NAME)
+    if refresh_token and settings.auth_type == AuthType.JWT_LOCAL:
+        try:
+            payload = _decode_refresh_token(refresh_token)
+        except jwt.PyJWTError:
+            pass
+        else:
+            # Revokes every access and refresh token issued to the user so far.
+            await storage.revoke_user_tokens(payload["sub"])
+            purge_user(payload["sub"])
     _clear_refresh_cookie(response, request)
     return {"ok": True}
 
@@ -262,12 +349,14 @@ async def change_password(payload: ChangePasswordRequest, user: AuthedUser) -> d
 
     record = await storage.get_user_by_sub(user.sub)
     if not record or not record.get("password_hash"):
+        await averify_password(payload.current_password, _DUMMY_HASH)
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    if not verify_password(payload.current_password, record["password_hash"]):
+    if not await averify_password(payload.current_password, record["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    password_hash = hash_password(payload.new_password)
+    password_hash = await ahash_password(payload.new_password)
     await storage.set_user_password(record["user_id"], password_hash)
+    purge_user(user.sub)
     return {"ok": True}
 
 
@@ -281,12 +370,18 @@ async def delete_account(payload: DeleteAccountRequest, user: AuthedUser) -> dic
 
     record = await storage.get_user_by_sub(user.sub)
     if not record or not record.get("password_hash"):
+        await averify_password(payload.password, _DUMMY_HASH)
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    if not verify_password(payload.password, record["password_hash"]):
+    if not await averify_password(payload.password, record["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    await clear_user_memory(user_id=user.user_id)
-    await storage.delete_user_data(user.user_id)
+    # Memory rows live in the vector store tables with no foreign key to the
+    # user, so both deletes can run at once.
+    await asyncio.gather(
+        clear_user_memory(user_id=user.user_id),
+        storage.delete_user_data(user.user_id),
+    )
+    purge_user(user.sub)
     return {"deleted": True}
 
 
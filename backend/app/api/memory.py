@@ -1,6 +1,10 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from typing import Annotated, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Query
+import orjson
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from app.auth.handlers import AuthedUser
@@ -18,14 +22,42 @@ class MemoryItem(BaseModel):
     assistant_id: Optional[str] = None
 
 
-@router.get("")
+class MemoryPage(BaseModel):
+    items: list[MemoryItem]
+    next_cursor: Optional[str] = None
+    """Pass as cursor to fetch the next page; absent on the last page."""
+
+
+def _encode_cursor(item: dict) -> str:
+    return urlsafe_b64encode(orjson.dumps([item["created_at"], item["id"]])).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[Optional[str], str]:
+    try:
+        created_at, memory_id = orjson.loads(urlsafe_b64decode(cursor))
+        # created_at is null for memories written before it was recorded.
+        if created_at is not None and not isinstance(created_at, str):
+            raise ValueError(cursor)
+        if not isinstance(memory_id, str):
+            raise ValueError(cursor)
+        UUID(memory_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, memory_id
+
+
+@router.get("", response_model=MemoryPage)
 async def get_memory(
     user: AuthedUser,
     limit: Annotated[int, Query(ge=1, le=500)] = 200,
-    offset: Annotated[int, Query(ge=0)] = 0,
-) -> list[MemoryItem]:
-    items = await list_user_memory(user_id=user.user_id, limit=limit, offset=offset)
-    return [MemoryItem(**item) for item in items]
+    cursor: Optional[str] = None,
+) -> ORJSONResponse:
+    before = _decode_cursor(cursor) if cursor else None
+    items = await list_user_memory(user_id=user.user_id, limit=limit, before=before)
+    next_cursor = _encode_cursor(items[-1]) if len(items) == limit else None
+    # Rows from list_user_memory already have the MemoryItem shape, so they are
+    # serialized directly instead of being validated into models first.
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
 
 
 @router.delete("/{memory_id}")
@@ -1,8 +1,14 @@
+import asyncio
+import contextlib
+import itertools
+import secrets
+from functools import lru_cache
 from typing import Any, Dict, Optional, Sequence, Union
-from uuid import UUID, uuid4
+from uuid import UUID
 
 import langsmith.client
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+import orjson
+from fastapi import APIRouter, HTTPException, Response
 from fastapi.exceptions import RequestValidationError
 from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
@@ -12,12 +18,34 @@ from sse_starlette import EventSourceResponse
 
 from app.agent import agent, chat_retrieval, chatbot
 from app.auth.handlers import AuthedUser
-from app.memory import build_memory_context, store_memory_messages, store_user_message
+from app.memory import (
+    build_memory_context,
+    enqueue_memory_documents,
+    memory_message_documents,
+    user_message_documents,
+)
 from app.storage import get_assistant, get_thread
 from app.stream import astream_state, to_sse
 
 router = APIRouter()
 
+# Injected memory messages only need ids that are unique within a thread, so a
+# per-process token plus a counter stands in for uuid4.
+_memory_msg_token = secrets.token_hex(4)
+_memory_msg_counter = itertools.count()
+
+# Strong references to runs started by create_run, so they are not garbage
+# collected while they are still executing.
+_background_runs: set[asyncio.Task] = set()
+
+# Input schemas are fixed per process, so they are built once rather than on
+# every run request.
+_INPUT_SCHEMAS = {
+    "chat_retrieval": chat_retrieval.get_input_schema(),
+    "chatbot": chatbot.get_input_schema(),
+    "agent": agent.get_input_schema(),
+}
+
 
 class CreateRunPayload(BaseModel):
     """Payload for creating a run."""
@@ -37,13 +65,16 @@ def _extract_latest_human_message(
     messages = input_ if isinstance(input_, list) else input_.get("messages")
     if not messages:
         return None
+    # Plain dict messages are matched with an exact type test, which is cheaper
+    # than isinstance; message objects fall through to the isinstance check.
     for msg in reversed(messages):
-        if isinstance(msg, HumanMessage):
+        if type(msg) is dict:
+            if msg.get("type") == "human":
+                content = msg.get("content")
+                if isinstance(content, str):
+                    return content
+        elif isinstance(msg, HumanMessage):
             return msg.content
-        if isinstance(msg, dict) and msg.get("type") == "human":
-            content = msg.get("content")
-            if isinstance(content, str):
-                return content
     return None
 
 
@@ -58,7 +89,7 @@ def _inject_system_message(
         "additional_kwargs": {},
         "type": "system",
         "example": False,
-        "id": f"memory-{uuid4().hex}",
+        "id": f"memory-{_memory_msg_token}-{next(_memory_msg_counter)}",
     }
     if isinstance(input_, list):
         if input_ and not isinstance(input_[0], dict):
@@ -68,8 +99,16 @@ def _inject_system_message(
     return {**input_, "messages": [system_message, *messages]}
 
 
-def _extract_ai_messages(messages: Sequence[AnyMessage]) -> list[AIMessage]:
-    return [message for message in messages if isinstance(message, AIMessage)]
+def _ai_messages_from_output(
+    output: Optional[Union[Sequence[AnyMessage], Dict[str, Any]]],
+) -> list[AIMessage]:
+    if not output:
+        return []
+    if isinstance(output, dict):
+        output = output.get("messages")
+        if not isinstance(output, list):
+            return []
+    return [message for message in output if isinstance(message, AIMessage)]
 
 
 async def _store_stream_ai_messages(
@@ -79,27 +118,18 @@ async def _store_stream_ai_messages(
     thread_id: str,
     assistant_id: Optional[str],
 ) -> None:
-    ai_messages = _extract_ai_messages(messages)
+    ai_messages = _ai_messages_from_output(messages)
     if ai_messages:
-        store_memory_messages(
-            messages=ai_messages,
-            user_id=user_id,
-            thread_id=thread_id,
-            assistant_id=assistant_id,
+        await enqueue_memory_documents(
+            memory_message_documents(
+                messages=ai_messages,
+                user_id=user_id,
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+            )
         )
 
 
-def _extract_output_messages(
-    output: Optional[Union[Sequence[AnyMessage], Dict[str, Any]]],
-) -> Sequence[AnyMessage]:
-    if not output:
-        return []
-    if isinstance(output, dict):
-        messages = output.get("messages")
-        return messages if isinstance(messages, list) else []
-    return output
-
-
 async def _run_and_store_ai_messages(
     input_: Optional[Union[Sequence[AnyMessage], Dict[str, Any]]],
     config: RunnableConfig,
@@ -109,64 +139,75 @@ async def _run_and_store_ai_messages(
     assistant_id: Optional[str],
 ) -> None:
     output = await agent.ainvoke(input_, config)
-    messages = _extract_output_messages(output)
-    ai_messages = _extract_ai_messages(messages)
+    ai_messages = _ai_messages_from_output(output)
     if ai_messages:
-        store_memory_messages(
-            messages=ai_messages,
-            user_id=user_id,
-            thread_id=thread_id,
-            assistant_id=assistant_id,
+        await enqueue_memory_documents(
+            memory_message_documents(
+                messages=ai_messages,
+                user_id=user_id,
+                thread_id=thread_id,
+                assistant_id=assistant_id,
+            )
         )
 
 
+async def _discard_task(task: Optional[asyncio.Task]) -> None:
+    """Cancel a task whose result is not needed and retrieve its outcome."""
+    if task is None:
+        return
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, Exception):
+        await task
+
+
 async def _run_input_and_config(payload: CreateRunPayload, user_id: str):
+    user_message = _extract_latest_human_message(payload.input)
+
     thread = await get_thread(user_id, payload.thread_id)
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
 
-    assistant = await get_assistant(user_id, str(thread.assistant_id))
-    if not assistant:
-        raise HTTPException(status_code=404, detail="Assistant not found")
-
-    config: RunnableConfig = {
-        **assistant.config,
-        "configurable": {
-            **assistant.config["configurable"],
-            **((payload.config or {}).get("configurable") or {}),
-            "user_id": user_id,
-            "thread_id": str(thread.thread_id),
-            "assistant_id": str(assistant.assistant_id),
-        },
-    }
-
-    bot_type = config["configurable"].get("type", "agent")
-
+    # The memory lookup only depends on the user and the message, so it runs
+    # alongside the assistant fetch and input validation.
+    memory_task = (
+        asyncio.create_task(build_memory_context(user_id=user_id, query=user_message))
+        if user_message and user_id
+        else None
+    )
     try:
-        if payload.input is not None:
-            # Get the correct schema based on bot type
-            if bot_type == "chat_retrieval":
-                schema = chat_retrieval.get_input_schema()
-            elif bot_type == "chatbot":
-                schema = chatbot.get_input_schema()
-            else:  # default to agent
-                schema = agent.get_input_schema()
-            # Validate against the correct schema
-            schema.model_validate(payload.input)
-    except ValidationError as e:
-        raise RequestValidationError(e.errors(), body=payload)
+        assistant = await get_assistant(user_id, str(thread.assistant_id))
+        if not assistant:
+            raise HTTPException(status_code=404, detail="Assistant not found")
+
+        configurable = assistant.config["configurable"].copy()
+        if override := (payload.config or {}).get("configurable"):
+            configurable.update(override)
+        configurable["user_id"] = user_id
+        configurable["thread_id"] = str(thread.thread_id)
+        configurable["assistant_id"] = str(assistant.assistant_id)
+        config: RunnableConfig = {**assistant.config, "configurable": configurable}
+
+        bot_type = config["configurable"].get("type", "agent")
+
+        try:
+            if payload.input is not None:
+                # Validate against the schema for the bot type, defaulting to agent
+                schema = _INPUT_SCHEMAS.get(bot_type, _INPUT_SCHEMAS["agent"])
+                schema.model_validate(payload.input)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(), body=payload)
+
+        # chat_retrieval does not use memory, so its lookup is dropped.
+        if bot_type == "chat_retrieval":
+            await _discard_task(memory_task)
+            memory_task = None
+    except BaseException:
+        await _discard_task(memory_task)
+        raise
 
     input_ = payload.input
-    user_message = _extract_latest_human_message(input_)
-    if (
-        user_message
-        and bot_type != "chat_retrieval"
-        and config["configurable"].get("user_id")
-    ):
-        memory_context = await build_memory_context(
-            user_id=config["configurable"]["user_id"],
-            query=user_message,
-        )
+    if memory_task is not None:
+        memory_context = await memory_task
         if memory_context:
             input_ = _inject_system_message(input_, memory_context)
 
@@ -177,26 +218,29 @@ async def _run_input_and_config(payload: CreateRunPayload, user_id: str):
 async def create_run(
     payload: CreateRunPayload,
     user: AuthedUser,
-    background_tasks: BackgroundTasks,
 ):
     """Create a run."""
     input_, config, user_message = await _run_input_and_config(payload, user.user_id)
     if user_message:
-        background_tasks.add_task(
-            store_user_message,
+        await enqueue_memory_documents(
+            user_message_documents(
+                user_id=user.user_id,
+                content=user_message,
+                thread_id=payload.thread_id,
+                assistant_id=config["configurable"].get("assistant_id"),
+            )
+        )
+    task = asyncio.create_task(
+        _run_and_store_ai_messages(
+            input_,
+            config,
             user_id=user.user_id,
-            content=user_message,
             thread_id=payload.thread_id,
             assistant_id=config["configurable"].get("assistant_id"),
         )
-    background_tasks.add_task(
-        _run_and_store_ai_messages,
-        input_,
-        config,
-        user_id=user.user_id,
-        thread_id=payload.thread_id,
-        assistant_id=config["configurable"].get("assistant_id"),
     )
+    _background_runs.add(task)
+    task.add_done_callback(_background_runs.discard)
     return {"status": "ok"}  # TODO add a run id
 
 
@@ -204,17 +248,17 @@ async def create_run(
 async def stream_run(
     payload: CreateRunPayload,
     user: AuthedUser,
-    background_tasks: BackgroundTasks,
 ):
     """Create a run."""
     input_, config, user_message = await _run_input_and_config(payload, user.user_id)
     if user_message:
-        background_tasks.add_task(
-            store_user_message,
-            user_id=user.user_id,
-            content=user_message,
-            thread_id=payload.thread_id,
-            assistant_id=config["configurable"].get("assistant_id"),
+        await enqueue_memory_documents(
+            user_message_documents(
+                user_id=user.user_id,
+                content=user_message,
+                thread_id=payload.thread_id,
+                assistant_id=config["configurable"].get("assistant_id"),
+            )
         )
 
     async def on_complete(messages: Sequence[AnyMessage]) -> None:
@@ -230,67 +274,90 @@ async def stream_run(
     )
 
 
+@lru_cache(maxsize=1)
+def _input_schema_json() -> bytes:
+    return orjson.dumps(_INPUT_SCHEMAS["agent"].model_json_schema())
+
+
+@lru_cache(maxsize=1)
+def _output_schema_json() -> bytes:
+    return orjson.dumps(agent.get_output_schema().model_json_schema())
+
+
+@lru_cache(maxsize=1)
+def _config_schema_json() -> bytes:
+    return orjson.dumps(agent.config_schema().model_json_schema())
+
+
 @router.get("/input_schema")
-async def input_schema() -> dict:
+async def input_schema() -> Response:
     """Return the input schema of the runnable."""
-    return agent.get_input_schema().model_json_schema()
+    return Response(_input_schema_json(), media_type="application/json")
 
 
 @router.get("/output_schema")
-async def output_schema() -> dict:
+async def output_schema() -> Response:
     """Return the output schema of the runnable."""
-    return agent.get_output_schema().model_json_schema()
+    return Response(_output_schema_json(), media_type="application/json")
 
 
 @router.get("/config_schema")
-async def config_schema() -> dict:
+async def config_schema() -> Response:
     """Return the config schema of the runnable."""
-    return agent.config_schema().model_json_schema()
+    return Response(_config_schema_json(), media_type="application/json")
 
 
-if tracing_is_enabled():
-    langsmith_client = langsmith.client.Client()
+@lru_cache(maxsize=1)
+def _langsmith_client() -> Optional[langsmith.client.Client]:
+    """Create the langsmith client on first use, if tracing is enabled."""
+    return langsmith.client.Client() if tracing_is_enabled() else None
 
-    class FeedbackCreateRequest(BaseModel):
-        """
-        Shared information between create requests of feedback and feedback objects
-        """
 
-        run_id: UUID
-        """The associated run ID this feedback is logged for."""
+class FeedbackCreateRequest(BaseModel):
+    """
+    Shared information between create requests of feedback and feedback objects
+    """
 
-        key: str
-        """The metric name, tag, or aspect to provide feedback on."""
+    run_id: UUID
+    """The associated run ID this feedback is logged for."""
 
-        score: Optional[Union[float, int, bool]] = None
-        """Value or score to assign the run."""
+    key: str
+    """The metric name, tag, or aspect to provide feedback on."""
 
-        value: Optional[Union[float, int, bool, str, Dict]] = None
-        """The display value for the feedback if not a metric."""
+    score: Optional[Union[float, int, bool]] = None
+    """Value or score to assign the run."""
 
-        comment: Optional[str] = None
-        """Comment or explanation for the feedback."""
+    value: Optional[Union[float, int, bool, str, Dict]] = None
+    """The display value for the feedback if not a metric."""
 
-    @router.post("/feedback")
-    def create_run_feedback(feedback_create_req: FeedbackCreateRequest) -> dict:
-        """
-        Send feedback on an individual run to langsmith
+    comment: Optional[str] = None
+    """Comment or explanation for the feedback."""
 
-        Note that a successful response means that feedback was successfully
-        submitted. It does not guarantee that the feedback is recorded by
-        langsmith. Requests may be silently rejected if they are
-        unauthenticated or invalid by the server.
-        """
 
-        langsmith_client.create_feedback(
-            feedback_create_req.run_id,
-            feedback_create_req.key,
-            score=feedback_create_req.score,
-            value=feedback_create_req.value,
-            comment=feedback_create_req.comment,
-            source_info={
-                "from_langserve": True,
-            },
-        )
+@router.post("/feedback")
+def create_run_feedback(feedback_create_req: FeedbackCreateRequest) -> dict:
+    """
+    Send feedback on an individual run to langsmith
+
+    Note that a successful response means that feedback was successfully
+    submitted. It does not guarantee that the feedback is recorded by
+    langsmith. Requests may be silently rejected if they are
+    unauthenticated or invalid by the server.
+    """
+
+    langsmith_client = _langsmith_client()
+    if langsmith_client is None:
+        raise HTTPException(status_code=503, detail="Tracing is disabled.")
+
+    langsmith_client.create_feedback(
+        feedback_create_req.run_id,
+        feedback_create_req.key,
+        score=feedback_create_req.score,
+        value=feedback_create_req.value,
+        comment=feedback_create_req.comment,
+        source_info={
+            "from_langserve": True,
+        },
+    )
 
-        return {"status": "ok"}
+    return {"status": "ok"}
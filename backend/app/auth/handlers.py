@@ -1,9 +1,12 @@
+import hashlib
+import time
 from abc import ABC, abstractmethod
 from functools import lru_cache
 from typing import Annotated
 
 import jwt
 import requests
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, Request
 from fastapi.security.http import HTTPBearer
 
@@ -11,6 +14,32 @@ import app.storage as storage
 from app.auth.settings import AuthType, settings
 from app.schema import User
 
+# Resolved (claims, user) pairs keyed by a truncated token digest. Entries are
+# additionally rejected once the token's own ``exp`` has passed.
+_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()[:16]
+
+
+def tokens_revoked(claims: dict, user: User) -> bool:
+    """Whether the token was issued before the user's tokens were revoked."""
+    if user.tokens_not_before is None:
+        return False
+    iat = claims.get("iat")
+    return not isinstance(iat, (int, float)) or (
+        iat < user.tokens_not_before.timestamp()
+    )
+
+
+def purge_user(sub: str) -> None:
+    """Drop all cached token resolutions for the given sub."""
+    for key in list(_token_cache.keys()):
+        entry = _token_cache.get(key)
+        if entry is not None and entry[0].get("sub") == sub:
+            _token_cache.pop(key, None)
+
 
 class AuthHandler(ABC):
     @abstractmethod
@@ -32,6 +61,13 @@ class JWTAuthBase(AuthHandler):
         http_bearer = await HTTPBearer()(request)
         token = http_bearer.credentials
 
+        cache_key = _token_cache_key(token)
+        if (cached := _token_cache.get(cache_key)) is not None:
+            claims, user = cached
+            if claims["exp"] > time.time():
+                return user
+            _token_cache.pop(cache_key, None)
+
         try:
             payload = self.decode_token(token, self.get_decode_key(token))
         except jwt.PyJWTError as e:
@@ -41,6 +77,11 @@ class JWTAuthBase(AuthHandler):
             raise HTTPException(status_code=401, detail="Invalid token type")
 
         user, _ = await storage.get_or_create_user(payload["sub"])
+        # Checked on resolution, so other workers honor a logout once their
+        # cached entry for the token expires.
+        if tokens_revoked(payload, user):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+        _token_cache[cache_key] = (payload, user)
         return user
 
     @abstractmethod
@@ -61,12 +102,12 @@ class JWTAuthLocal(JWTAuthBase):
             decode_key,
             issuer=settings.jwt_local.iss,
             audience=settings.jwt_local.aud,
-            algorithms=[settings.jwt_local.alg.upper()],
+            algorithms=[settings.jwt_local.alg_upper],
             options={"require": ["exp", "iss", "aud", "sub"]},
         )
 
     def get_decode_key(self, token: str) -> str:
-        return settings.jwt_local.decode_key
+        return settings.jwt_local.verify_key
 
 
 class JWTAuthOIDC(JWTAuthBase):
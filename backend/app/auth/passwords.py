@@ -1,8 +1,15 @@
+import asyncio
 import base64
 import hashlib
 import hmac
-import secrets
+import os
+import string
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from typing import Iterable
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 
 
 @dataclass(frozen=True)
@@ -15,37 +22,98 @@ class PasswordPolicy:
 
 DEFAULT_POLICY = PasswordPolicy()
 HASH_NAME = "sha256"
-PBKDF2_ITERATIONS = 200_000
-SALT_BYTES = 16
+ARGON2_PREFIX = "$argon2"
+LEGACY_PBKDF2_PREFIX = "pbkdf2_"
+
+_ASCII_LETTERS = frozenset(string.ascii_letters)
+_ASCII_DIGITS = frozenset(string.digits)
+_ASCII_ALNUM = _ASCII_LETTERS | _ASCII_DIGITS
+
+_hasher = PasswordHasher(
+    time_cost=3,
+    memory_cost=65536,
+    parallelism=2,
+    hash_len=32,
+    salt_len=16,
+)
+
+# Dedicated pool for KDF work, so bursts of logins cannot starve the default
+# threadpool the rest of the app relies on. argon2 releases the GIL.
+_KDF_POOL = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1, thread_name_prefix="kdf"
+)
+
+
+def _character_classes(password: str) -> tuple[bool, bool, bool]:
+    """Whether password has a letter, a digit and a non-alphanumeric char."""
+    chars = set(password)
+    if password.isascii():
+        return (
+            not chars.isdisjoint(_ASCII_LETTERS),
+            not chars.isdisjoint(_ASCII_DIGITS),
+            not chars <= _ASCII_ALNUM,
+        )
+    return (
+        any(ch.isalpha() for ch in chars),
+        any(ch.isdigit() for ch in chars),
+        any(not ch.isalnum() for ch in chars),
+    )
 
 
 def validate_password(password: str, policy: PasswordPolicy = DEFAULT_POLICY) -> None:
     if len(password) < policy.min_length:
         raise ValueError(f"password must be at least {policy.min_length} characters")
-    if policy.require_letter and not any(ch.isalpha() for ch in password):
+    has_letter, has_digit, has_special = _character_classes(password)
+    if policy.require_letter and not has_letter:
         raise ValueError("password must include a letter")
-    if policy.require_digit and not any(ch.isdigit() for ch in password):
+    if policy.require_digit and not has_digit:
         raise ValueError("password must include a number")
-    if policy.require_special and not any(not ch.isalnum() for ch in password):
+    if policy.require_special and not has_special:
         raise ValueError("password must include a special character")
 
 
 def hash_password(password: str) -> str:
-    salt = secrets.token_bytes(SALT_BYTES)
-    dk = hashlib.pbkdf2_hmac(
-        HASH_NAME, password.encode("utf-8"), salt, PBKDF2_ITERATIONS
-    )
-    encoded_salt = base64.b64encode(salt).decode("ascii")
-    encoded_hash = base64.b64encode(dk).decode("ascii")
-    return f"pbkdf2_{HASH_NAME}${PBKDF2_ITERATIONS}${encoded_salt}${encoded_hash}"
+    return _hasher.hash(password)
 
 
 def verify_password(password: str, stored_hash: str) -> bool:
+    if stored_hash.startswith(LEGACY_PBKDF2_PREFIX):
+        return _verify_legacy_pbkdf2(password, stored_hash)
     try:
-        scheme, iterations, encoded_salt, encoded_hash = stored_hash.split("$", 3)
-    except ValueError:
+        return _hasher.verify(stored_hash, password)
+    except (VerificationError, InvalidHashError):
         return False
-    if not scheme.startswith("pbkdf2_"):
+
+
+def hash_passwords_bulk(passwords: Iterable[str]) -> list[str]:
+    """Hash many passwords at once, spread across the KDF pool. Order is kept."""
+    return list(_KDF_POOL.map(hash_password, passwords))
+
+
+async def ahash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_KDF_POOL, hash_password, password)
+
+
+async def averify_password(password: str, stored_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_KDF_POOL, verify_password, password, stored_hash)
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """Whether a verified hash should be upgraded to the current parameters."""
+    if not stored_hash.startswith(ARGON2_PREFIX):
+        return True
+    try:
+        return _hasher.check_needs_rehash(stored_hash)
+    except InvalidHashError:
+        return True
+
+
+def _verify_legacy_pbkdf2(password: str, stored_hash: str) -> bool:
+    try:
+        _, iterations, encoded_salt, encoded_hash = stored_hash.split("$", 3)
+    except ValueError:
         return False
     try:
         iterations_int = int(iterations)
@@ -0,0 +1,45 @@
+"""In-process sliding-window rate limiting for the auth endpoints."""
+
+import math
+import time
+from collections import deque
+from typing import Hashable, Optional
+
+from cachetools import TTLCache
+from fastapi import HTTPException
+
+
+class SlidingWindowLimiter:
+    """Allow at most ``limit`` hits per key within any ``window`` seconds."""
+
+    def __init__(self, limit: int, window: float, maxsize: int = 50_000) -> None:
+        self.limit = limit
+        self.window = window
+        # Keys are re-inserted on every hit, so an entry only expires once it
+        # has been idle for a whole window and holds no relevant timestamps.
+        self._hits: TTLCache = TTLCache(maxsize=maxsize, ttl=window)
+
+    def hit(self, key: Hashable) -> Optional[float]:
+        """Record a hit and return the seconds to wait if over the limit."""
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = deque()
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            self._hits[key] = hits
+            return hits[0] + self.window - now
+        hits.append(now)
+        self._hits[key] = hits
+        return None
+
+    def check(self, *key: Hashable) -> None:
+        """Raise a 429 with Retry-After if the key is over the limit."""
+        retry_after = self.hit(key)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
@@ -1,11 +1,21 @@
+import hashlib
+import hmac
 import os
 from base64 import b64decode
 from enum import Enum
-from typing import List, Optional, Union
+from functools import cached_property
+from typing import Any, List, Optional, Union
 
+from cryptography.hazmat.primitives import serialization
 from pydantic import ConfigDict, field_validator, model_validator
 from pydantic_settings import BaseSettings
 
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
 
 class AuthType(Enum):
     NOOP = "noop"
@@ -47,6 +57,51 @@ class JWTSettingsLocal(JWTSettingsBase):
             return b64decode(decode_key_b64).decode("utf-8")
         return v
 
+    @cached_property
+    def alg_upper(self) -> str:
+        return self.alg.upper()
+
+    @cached_property
+    def access_claims(self) -> dict:
+        """Claims shared by every access token issued by this process."""
+        return {"iss": self.iss, "aud": self.aud, "token_use": "access"}
+
+    @cached_property
+    def refresh_claims(self) -> dict:
+        """Claims shared by every refresh token issued by this process."""
+        return {"iss": self.iss, "aud": self.aud, "token_use": "refresh"}
+
+    @cached_property
+    def signing_key(self) -> Any:
+        """
+        Key passed to jwt.encode. PEM private keys are parsed once here rather
+        than by PyJWT on every call.
+        """
+        if self.alg_upper.startswith("HS"):
+            return self.decode_key.encode("utf-8")
+        if "PRIVATE KEY" in self.decode_key:
+            return serialization.load_pem_private_key(
+                self.decode_key.encode("utf-8"), password=None
+            )
+        return self.decode_key
+
+    @cached_property
+    def hmac_signer(self) -> Optional[hmac.HMAC]:
+        """Keyed HMAC for HS* algorithms, meant to be copied per token."""
+        digest = _HMAC_DIGESTS.get(self.alg_upper)
+        if digest is None:
+            return None
+        return hmac.new(self.signing_key, digestmod=digest)
+
+    @cached_property
+    def verify_key(self) -> Any:
+        """Key passed to jwt.decode, parsed once like signing_key."""
+        if self.alg_upper.startswith("HS"):
+            return self.decode_key.encode("utf-8")
+        if "PRIVATE KEY" in self.decode_key:
+            return self.signing_key.public_key()
+        return serialization.load_pem_public_key(self.decode_key.encode("utf-8"))
+
 
 class JWTSettingsOIDC(JWTSettingsBase):
     ...
@@ -58,6 +113,8 @@ class Settings(BaseSettings):
     jwt_oidc: Optional[JWTSettingsOIDC] = None
     access_token_ttl_minutes: int = 60
     refresh_token_ttl_days: int = 7
+    auth_rate_limit: int = 10
+    auth_rate_limit_window_seconds: int = 60
 
     @model_validator(mode="before")
     @classmethod
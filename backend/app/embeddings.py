@@ -1,26 +1,224 @@
+import asyncio
+import functools
+import itertools
 import os
-from typing import List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from threading import Lock
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
 
 import httpx
 from langchain_core.embeddings import Embeddings
+from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
+
+# Texts per OpenAI embeddings request.
+EMBEDDINGS_CHUNK_SIZE = 256
+# Seconds before a slow local embeddings request is hedged on another replica.
+_LOCAL_HEDGE_DELAY = 0.3
+# The OpenAI client retries 429s and transient errors with exponential backoff.
+_OPENAI_EMBEDDINGS_OPTIONS = {
+    "chunk_size": EMBEDDINGS_CHUNK_SIZE,
+    "max_retries": 6,
+    "request_timeout": 60,
+}
+_OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+
+
+@dataclass(frozen=True)
+class EmbeddingsConfig:
+    """Embeddings settings, read from the environment once at import."""
+
+    provider: str
+    local_urls: Tuple[str, ...]
+    local_model_id: str
+    has_openai_key: bool
+    has_azure_key: bool
+    azure_endpoint: Optional[str]
+    azure_deployment: Optional[str]
+    azure_api_version: Optional[str]
+    storage: str
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingsConfig":
+        return cls(
+            provider=os.environ.get("EMBEDDINGS_PROVIDER", "").lower(),
+            local_urls=tuple(
+                url.strip()
+                for url in os.environ.get("EMBEDDINGS_URL", "").split(",")
+                if url.strip()
+            ),
+            local_model_id=os.environ.get("EMBEDDINGS_MODEL_ID", "local").lower(),
+            has_openai_key=bool(os.environ.get("OPENAI_API_KEY")),
+            has_azure_key=bool(os.environ.get("AZURE_OPENAI_API_KEY")),
+            azure_endpoint=os.environ.get("AZURE_OPENAI_API_BASE"),
+            azure_deployment=os.environ.get("AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT_NAME"),
+            azure_api_version=os.environ.get("AZURE_OPENAI_API_VERSION"),
+            storage=os.environ.get("EMBEDDING_STORAGE", "vector").lower(),
+        )
+
+
+EMBEDDINGS_CONFIG = EmbeddingsConfig.from_env()
 
 
 class LocalEmbeddings(Embeddings):
-    def __init__(self, base_url: str, timeout: float = 60.0) -> None:
-        self.base_url = base_url.rstrip("/")
-        self._client = httpx.Client(timeout=timeout)
+    """Embeddings served by local TEI-compatible ``/embed`` endpoints.
+
+    Inputs are split into requests of at most ``batch_size`` texts and
+    ``max_chars_per_request`` characters, which are sent concurrently over
+    pooled keep-alive connections and reassembled in order. Requests are
+    spread round-robin over ``base_url``, which may list several replicas.
+
+    If ``hedge_delay`` is set, a request still running after that many seconds
+    is raced against an identical one on the next replica, as long as hedges
+    stay within ``hedge_budget`` of all requests. Hedging is off by default,
+    since a hedge sent to the same replica only adds to its queue.
+    """
+
+    def __init__(
+        self,
+        base_url: Union[str, Sequence[str]],
+        timeout: float = 60.0,
+        *,
+        batch_size: int = 16,
+        max_chars_per_request: int = 10_000,
+        max_concurrent_requests: int = 8,
+        hedge_delay: Optional[float] = None,
+        hedge_budget: float = 0.05,
+    ) -> None:
+        urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.base_urls = [url.rstrip("/") for url in urls]
+        self.batch_size = batch_size
+        self.max_chars_per_request = max_chars_per_request
+        self.max_concurrent_requests = max_concurrent_requests
+        self.hedge_delay = hedge_delay
+        self.hedge_budget = hedge_budget
+        # Room for every batch request plus its hedge, all kept alive.
+        limits = httpx.Limits(
+            max_connections=2 * max_concurrent_requests,
+            max_keepalive_connections=2 * max_concurrent_requests,
+        )
+        client_timeout = httpx.Timeout(timeout, connect=5.0)
+        self._client = httpx.Client(limits=limits, timeout=client_timeout)
+        self._async_client = httpx.AsyncClient(limits=limits, timeout=client_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_requests)
+        # Separate pool so hedged posts never wait behind the batch fan-out.
+        self._hedge_executor = ThreadPoolExecutor(
+            max_workers=2 * max_concurrent_requests
+        )
+        self._hedge_lock = Lock()
+        self._request_counter = itertools.count(1)
+        self._hedged_requests = 0
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return self._embed(texts)
+        batches = list(self._batches(texts))
+        if len(batches) <= 1:
+            return self._embed(texts) if texts else []
+        results = self._executor.map(self._embed, batches)
+        return [embedding for batch in results for embedding in batch]
 
     def embed_query(self, text: str) -> List[float]:
         return self._embed([text])[0]
 
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._aembed(batch)
+
+        results = await asyncio.gather(
+            *(embed_batch(batch) for batch in self._batches(texts))
+        )
+        return [embedding for batch in results for embedding in batch]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._aembed([text]))[0]
+
+    def _batches(self, texts: List[str]) -> Iterator[List[str]]:
+        batch: List[str] = []
+        batch_chars = 0
+        for text in texts:
+            if batch and (
+                len(batch) >= self.batch_size
+                or batch_chars + len(text) > self.max_chars_per_request
+            ):
+                yield batch
+                batch = []
+                batch_chars = 0
+            batch.append(text)
+            batch_chars += len(text)
+        if batch:
+            yield batch
+
     def _embed(self, texts: List[str]) -> List[List[float]]:
-        response = self._client.post(
-            f"{self.base_url}/embed",
-            json={"inputs": texts},
+        return self._parse_response(self._post_hedged({"inputs": texts}))
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        return self._parse_response(await self._apost_hedged({"inputs": texts}))
+
+    def _url(self, request_number: int) -> str:
+        return f"{self.base_urls[request_number % len(self.base_urls)]}/embed"
+
+    def _post(self, payload: dict, request_number: int) -> httpx.Response:
+        return self._client.post(self._url(request_number), json=payload)
+
+    def _apost(
+        self, payload: dict, request_number: int
+    ) -> "asyncio.Future[httpx.Response]":
+        return asyncio.ensure_future(
+            self._async_client.post(self._url(request_number), json=payload)
         )
+
+    def _take_hedge(self, total_requests: int) -> bool:
+        """Reserve a hedge if it keeps hedges within the budget."""
+        with self._hedge_lock:
+            if self._hedged_requests + 1 > total_requests * self.hedge_budget:
+                return False
+            self._hedged_requests += 1
+            return True
+
+    def _post_hedged(self, payload: dict) -> httpx.Response:
+        total_requests = next(self._request_counter)
+        if self.hedge_delay is None:
+            return self._post(payload, total_requests)
+        primary = self._hedge_executor.submit(self._post, payload, total_requests)
+        try:
+            return primary.result(timeout=self.hedge_delay)
+        except FutureTimeoutError:
+            pass
+        if not self._take_hedge(total_requests):
+            return primary.result()
+        backup = self._hedge_executor.submit(self._post, payload, total_requests + 1)
+        done, _ = wait((primary, backup), return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() is None:
+            return winner.result()
+        # The first finisher failed; fall back to the other request.
+        return (backup if winner is primary else primary).result()
+
+    async def _apost_hedged(self, payload: dict) -> httpx.Response:
+        total_requests = next(self._request_counter)
+        if self.hedge_delay is None:
+            return await self._apost(payload, total_requests)
+        primary = self._apost(payload, total_requests)
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+        if done or not self._take_hedge(total_requests):
+            return await primary
+        backup = self._apost(payload, total_requests + 1)
+        done, pending = await asyncio.wait(
+            {primary, backup}, return_when=asyncio.FIRST_COMPLETED
+        )
+        winner = done.pop()
+        if winner.exception() is None:
+            for task in pending:
+                task.cancel()
+            return winner.result()
+        # The first finisher failed; fall back to the other request.
+        return await (backup if winner is primary else primary)
+
+    @staticmethod
+    def _parse_response(response: httpx.Response) -> List[List[float]]:
         response.raise_for_status()
         data = response.json()
         if isinstance(data, dict) and "embeddings" in data:
@@ -28,13 +226,36 @@ class LocalEmbeddings(Embeddings):
         return data
 
 
+@functools.lru_cache(maxsize=1)
 def get_embeddings_client() -> Embeddings:
-    provider = os.environ.get("EMBEDDINGS_PROVIDER", "").lower()
-    if provider == "local":
-        base_url = os.environ.get("EMBEDDINGS_URL")
-        if not base_url:
+    """The embeddings client for the configured provider, shared process-wide."""
+    config = EMBEDDINGS_CONFIG
+    if config.provider == "local":
+        if not config.local_urls:
             raise ValueError(
                 "EMBEDDINGS_URL must be set when EMBEDDINGS_PROVIDER=local"
             )
-        return LocalEmbeddings(base_url)
-    raise ValueError(f"Unsupported embeddings provider: {provider}")
+        # Hedges only help when they can go to another replica.
+        return LocalEmbeddings(
+            config.local_urls,
+            hedge_delay=_LOCAL_HEDGE_DELAY if len(config.local_urls) > 1 else None,
+        )
+    # One pool of HTTP connections serves every sync and async request.
+    http_options = {
+        "http_client": httpx.Client(limits=_OPENAI_HTTP_LIMITS),
+        "http_async_client": httpx.AsyncClient(limits=_OPENAI_HTTP_LIMITS),
+    }
+    if config.has_openai_key:
+        return OpenAIEmbeddings(**_OPENAI_EMBEDDINGS_OPTIONS, **http_options)
+    if config.has_azure_key:
+        return AzureOpenAIEmbeddings(
+            azure_endpoint=config.azure_endpoint,
+            azure_deployment=config.azure_deployment,
+            openai_api_version=config.azure_api_version,
+            **_OPENAI_EMBEDDINGS_OPTIONS,
+            **http_options,
+        )
+    raise ValueError(
+        "Set EMBEDDINGS_PROVIDER=local with EMBEDDINGS_URL, "
+        "or configure OPENAI_API_KEY/AZURE_OPENAI_API_KEY."
+    )
@@ -6,7 +6,10 @@ into a vector store.
 This code should be agnostic to how the blob got generated; i.e., it does not
 know about server/uploading etc.
 """
-from typing import Callable, List, Optional
+import hashlib
+import queue
+import threading
+from typing import Any, Callable, Iterator, List, Optional, Set, Tuple
 
 from langchain.text_splitter import TextSplitter
 from langchain_community.document_loaders import Blob
@@ -14,6 +17,11 @@ from langchain_community.document_loaders.base import BaseBlobParser
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
 
+# Batches queued ahead of each indexing stage. Small, so parsing never runs far
+# ahead of embedding and memory stays bounded.
+_INDEX_QUEUE_SIZE = 2
+_DONE = object()
+
 
 def _update_document_metadata(document: Document, namespace: str) -> None:
     """Mutation in place that adds a namespace to the document metadata."""
@@ -27,49 +35,183 @@ def _sanitize_document_content(document: Document) -> Document:
     document.page_content = document.page_content.replace("\x00", "x")
 
 
-# PUBLIC API
+def _content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
 
 
-def ingest_blob(
+def _utf8_len(text: str) -> int:
+    """UTF-8 size of text, without encoding it in the common ASCII case."""
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+def _iter_batches(
     blob: Blob,
     parser: BaseBlobParser,
     text_splitter: TextSplitter,
-    vectorstore: VectorStore,
     namespace: str,
     *,
-    batch_size: int = 100,
-    max_batch_chars: int = 50_000,
-    progress_callback: Optional[Callable[[int], None]] = None,
-    should_cancel: Optional[Callable[[], bool]] = None,
-) -> List[str]:
-    """Ingest a document into the vectorstore."""
+    batch_size: int,
+    max_batch_chars: int,
+    progress_callback: Optional[Callable[[int], None]],
+    should_cancel: Optional[Callable[[], bool]],
+) -> Iterator[List[Document]]:
+    """Parse and split the blob, yielding batches of documents to index.
+
+    Progress is reported in coalesced steps rather than once per chunk. Each
+    chunk's content hash is stored in its metadata, and repeats are skipped.
+    """
+    progress_step = max(max_batch_chars // 4, 4096)
+    pending_bytes = 0
+    seen_hashes: Set[str] = set()
     docs_to_index = []
-    ids = []
     batch_chars = 0
     for document in parser.lazy_parse(blob):
         docs = text_splitter.split_documents([document])
         for doc in docs:
             if should_cancel and should_cancel():
-                return ids
+                return
             _sanitize_document_content(doc)
+            if progress_callback:
+                pending_bytes += _utf8_len(doc.page_content)
+                if pending_bytes >= progress_step:
+                    progress_callback(pending_bytes)
+                    pending_bytes = 0
+            # Repeated chunks, such as headers and footers, are indexed once.
+            content_hash = _content_hash(doc.page_content)
+            if content_hash in seen_hashes:
+                continue
+            seen_hashes.add(content_hash)
             _update_document_metadata(doc, namespace)
+            doc.metadata["hash"] = content_hash
             docs_to_index.append(doc)
             batch_chars += len(doc.page_content)
-            if progress_callback:
-                processed_bytes = len(doc.page_content.encode("utf-8"))
-                if processed_bytes:
-                    progress_callback(processed_bytes)
 
             if len(docs_to_index) >= batch_size or batch_chars >= max_batch_chars:
-                if should_cancel and should_cancel():
-                    return ids
-                ids.extend(vectorstore.add_documents(docs_to_index))
+                if pending_bytes:
+                    progress_callback(pending_bytes)
+                    pending_bytes = 0
+                yield docs_to_index
                 docs_to_index = []
                 batch_chars = 0
 
+    if pending_bytes:
+        progress_callback(pending_bytes)
     if docs_to_index:
-        if should_cancel and should_cancel():
-            return ids
-        ids.extend(vectorstore.add_documents(docs_to_index))
+        yield docs_to_index
+
+
+def _index_stages(
+    vectorstore: VectorStore, namespace: str
+) -> List[Callable[[Any], Any]]:
+    """Indexing work for a batch of documents, as a sequence of stages.
+
+    Stores that accept precomputed embeddings get separate embedding and
+    writing stages, so one batch is written while the next is embedded. If
+    the store can also report known content hashes, chunks it already holds
+    for the namespace are dropped before embedding.
+    """
+    embeddings = vectorstore.embeddings
+    add_embeddings = getattr(vectorstore, "add_embeddings", None)
+    if embeddings is None or add_embeddings is None:
+        return [vectorstore.add_documents]
+    known_hashes = getattr(vectorstore, "known_hashes", None)
+
+    def embed(batch: List[Document]) -> Tuple[List[Document], List[List[float]]]:
+        if known_hashes is not None:
+            known = known_hashes(namespace, [doc.metadata["hash"] for doc in batch])
+            batch = [doc for doc in batch if doc.metadata["hash"] not in known]
+        if not batch:
+            return batch, []
+        return batch, embeddings.embed_documents([doc.page_content for doc in batch])
+
+    def write(embedded: Tuple[List[Document], List[List[float]]]) -> List[str]:
+        batch, vectors = embedded
+        if not batch:
+            return []
+        return add_embeddings(
+            texts=[doc.page_content for doc in batch],
+            embeddings=vectors,
+            metadatas=[doc.metadata for doc in batch],
+        )
+
+    return [embed, write]
+
+
+# PUBLIC API
+
+
+def ingest_blob(
+    blob: Blob,
+    parser: BaseBlobParser,
+    text_splitter: TextSplitter,
+    vectorstore: VectorStore,
+    namespace: str,
+    *,
+    batch_size: int = 100,
+    max_batch_chars: int = 50_000,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+) -> List[str]:
+    """Ingest a document into the vectorstore.
+
+    Parsing and splitting run on the calling thread while each indexing stage
+    runs on its own thread, connected by small queues, so all stages overlap.
+    """
+    stages = _index_stages(vectorstore, namespace)
+    inboxes = [queue.Queue(maxsize=_INDEX_QUEUE_SIZE) for _ in stages]
+    ids: List[str] = []
+    errors: List[Exception] = []
+
+    def run_stage(stage: Callable[[Any], Any], index: int) -> None:
+        inbox = inboxes[index]
+        outbox = inboxes[index + 1] if index + 1 < len(inboxes) else None
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            # Keep draining after a failure or cancel so the stage before
+            # never blocks on a full queue.
+            if errors or (should_cancel and should_cancel()):
+                continue
+            try:
+                result = stage(item)
+            except Exception as exc:
+                errors.append(exc)
+                continue
+            if outbox is None:
+                ids.extend(result)
+            else:
+                outbox.put(result)
+        if outbox is not None:
+            outbox.put(_DONE)
+
+    workers = [
+        threading.Thread(
+            target=run_stage, args=(stage, index), name=f"ingest-stage-{index}"
+        )
+        for index, stage in enumerate(stages)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for batch in _iter_batches(
+            blob,
+            parser,
+            text_splitter,
+            namespace,
+            batch_size=batch_size,
+            max_batch_chars=max_batch_chars,
+            progress_callback=progress_callback,
+            should_cancel=should_cancel,
+        ):
+            if errors:
+                break
+            inboxes[0].put(batch)
+    finally:
+        inboxes[0].put(_DONE)
+        for worker in workers:
+            worker.join()
 
+    if errors:
+        raise errors[0]
     return ids
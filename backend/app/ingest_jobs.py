@@ -1,9 +1,14 @@
+import os
 from dataclasses import dataclass, field
-from threading import Lock
 from time import time
-from typing import Optional
+from typing import Optional, Protocol
 from uuid import uuid4
 
+from app.lifespan import get_pg_pool
+
+# Finished jobs are kept this long after their last update, then pruned.
+JOB_TTL_SECONDS = 3600
+
 
 @dataclass
 class IngestJob:
@@ -17,60 +22,187 @@ class IngestJob:
     updated_at: float = field(default_factory=time)
 
 
-_jobs: dict[str, IngestJob] = {}
-_lock = Lock()
+class JobStore(Protocol):
+    async def create(self, job: IngestJob) -> None: ...
 
+    async def get(self, job_id: str) -> Optional[IngestJob]: ...
+
+    async def update_progress(self, job_id: str, processed_bytes: int) -> bool:
+        """Record progress; returns False once the job is no longer running."""
+        ...
+
+    async def mark_done(self, job_id: str) -> None: ...
+
+    async def mark_error(self, job_id: str, error: str) -> None: ...
+
+    async def cancel(self, job_id: str) -> bool: ...
 
-def create_job(total_bytes: int) -> IngestJob:
-    job_id = uuid4().hex
-    job = IngestJob(job_id=job_id, total_bytes=total_bytes)
-    with _lock:
-        _jobs[job_id] = job
-    return job
 
+class MemoryJobStore:
+    """Jobs held in this process. Only suitable for a single API worker."""
 
-def get_job(job_id: str) -> Optional[IngestJob]:
-    with _lock:
-        return _jobs.get(job_id)
+    def __init__(self) -> None:
+        self._jobs: dict[str, IngestJob] = {}
 
+    async def create(self, job: IngestJob) -> None:
+        cutoff = time() - JOB_TTL_SECONDS
+        expired = [
+            job_id
+            for job_id, existing in self._jobs.items()
+            if existing.status != "running" and existing.updated_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._jobs[job.job_id] = job
 
-def update_progress(job_id: str, processed_bytes: int) -> None:
-    with _lock:
-        job = _jobs.get(job_id)
+    async def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    async def update_progress(self, job_id: str, processed_bytes: int) -> bool:
+        job = self._jobs.get(job_id)
         if not job or job.status != "running":
-            return
-        job.processed_bytes = processed_bytes
+            return False
+        job.processed_bytes = max(job.processed_bytes, processed_bytes)
         if job.total_bytes:
             progress = min(processed_bytes / job.total_bytes, 0.99)
             job.progress = max(job.progress, progress)
         job.updated_at = time()
+        return True
 
-
-def mark_done(job_id: str) -> None:
-    with _lock:
-        job = _jobs.get(job_id)
+    async def mark_done(self, job_id: str) -> None:
+        job = self._jobs.get(job_id)
         if not job:
             return
         job.status = "done"
         job.progress = 1.0
         job.updated_at = time()
 
-
-def mark_error(job_id: str, error: str) -> None:
-    with _lock:
-        job = _jobs.get(job_id)
+    async def mark_error(self, job_id: str, error: str) -> None:
+        job = self._jobs.get(job_id)
         if not job:
             return
         job.status = "error"
         job.error = error
         job.updated_at = time()
 
-
-def cancel_job(job_id: str) -> bool:
-    with _lock:
-        job = _jobs.get(job_id)
+    async def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
         if not job or job.status != "running":
             return False
         job.status = "canceled"
         job.updated_at = time()
         return True
+
+
+class PostgresJobStore:
+    """Jobs in the ingest_job table, shared by every API worker."""
+
+    async def create(self, job: IngestJob) -> None:
+        async with get_pg_pool().acquire() as conn:
+            await conn.execute(
+                "DELETE FROM ingest_job WHERE status <> 'running' "
+                "AND updated_at < now() - make_interval(secs => $1)",
+                JOB_TTL_SECONDS,
+            )
+            await conn.execute(
+                "INSERT INTO ingest_job (job_id, total_bytes) VALUES ($1, $2)",
+                job.job_id,
+                job.total_bytes,
+            )
+
+    async def get(self, job_id: str) -> Optional[IngestJob]:
+        async with get_pg_pool().acquire() as conn:
+            record = await conn.fetchrow(
+                "SELECT * FROM ingest_job WHERE job_id = $1", job_id
+            )
+        if record is None:
+            return None
+        return IngestJob(
+            job_id=record["job_id"],
+            status=record["status"],
+            progress=record["progress"],
+            error=record["error"],
+            total_bytes=record["total_bytes"],
+            processed_bytes=record["processed_bytes"],
+            created_at=record["created_at"].timestamp(),
+            updated_at=record["updated_at"].timestamp(),
+        )
+
+    async def update_progress(self, job_id: str, processed_bytes: int) -> bool:
+        # Updates may arrive out of order, so both counters only move forward.
+        async with get_pg_pool().acquire() as conn:
+            updated = await conn.fetchval(
+                (
+                    "UPDATE ingest_job SET "
+                    "processed_bytes = GREATEST(processed_bytes, $2), "
+                    "progress = CASE WHEN total_bytes > 0 "
+                    "THEN GREATEST(progress, LEAST($2::float8 / total_bytes, 0.99)) "
+                    "ELSE progress END, "
+                    "updated_at = now() "
+                    "WHERE job_id = $1 AND status = 'running' RETURNING true"
+                ),
+                job_id,
+                processed_bytes,
+            )
+        return bool(updated)
+
+    async def mark_done(self, job_id: str) -> None:
+        async with get_pg_pool().acquire() as conn:
+            await conn.execute(
+                "UPDATE ingest_job SET status = 'done', progress = 1.0, "
+                "updated_at = now() WHERE job_id = $1",
+                job_id,
+            )
+
+    async def mark_error(self, job_id: str, error: str) -> None:
+        async with get_pg_pool().acquire() as conn:
+            await conn.execute(
+                "UPDATE ingest_job SET status = 'error', error = $2, "
+                "updated_at = now() WHERE job_id = $1",
+                job_id,
+                error,
+            )
+
+    async def cancel(self, job_id: str) -> bool:
+        async with get_pg_pool().acquire() as conn:
+            canceled = await conn.fetchval(
+                "UPDATE ingest_job SET status = 'canceled', updated_at = now() "
+                "WHERE job_id = $1 AND status = 'running' RETURNING true",
+                job_id,
+            )
+        return bool(canceled)
+
+
+def _make_store() -> JobStore:
+    if os.environ.get("INGEST_JOB_STORE", "postgres").lower() == "memory":
+        return MemoryJobStore()
+    return PostgresJobStore()
+
+
+_store: JobStore = _make_store()
+
+
+async def create_job(total_bytes: int) -> IngestJob:
+    job = IngestJob(job_id=uuid4().hex, total_bytes=total_bytes)
+    await _store.create(job)
+    return job
+
+
+async def get_job(job_id: str) -> Optional[IngestJob]:
+    return await _store.get(job_id)
+
+
+async def update_progress(job_id: str, processed_bytes: int) -> bool:
+    return await _store.update_progress(job_id, processed_bytes)
+
+
+async def mark_done(job_id: str) -> None:
+    await _store.mark_done(job_id)
+
+
+async def mark_error(job_id: str, error: str) -> None:
+    await _store.mark_error(job_id, error)
+
+
+async def cancel_job(job_id: str) -> bool:
+    return await _store.cancel(job_id)
@@ -1,6 +1,7 @@
 import os
 from contextlib import asynccontextmanager
 
+import anyio.to_thread
 import asyncpg
 import orjson
 import structlog
@@ -15,6 +16,35 @@ def get_pg_pool() -> asyncpg.pool.Pool:
     return _pg_pool
 
 
+async def create_index_concurrently(name: str, table: str, columns: str) -> None:
+    """Create an index at startup without blocking writes to its table.
+
+    For tables created at runtime rather than by migrations, so nothing is done
+    if the table does not exist yet. The index is built with CREATE INDEX
+    CONCURRENTLY by whichever worker takes the advisory lock; the others skip
+    it. An invalid index left by an interrupted build is dropped and rebuilt.
+    """
+    async with get_pg_pool().acquire() as conn:
+        if await conn.fetchval("SELECT to_regclass($1)::text", table) is None:
+            return
+        if not await conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", name):
+            return
+        try:
+            valid = await conn.fetchval(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)",
+                name,
+            )
+            if valid:
+                return
+            if valid is not None:
+                await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            await conn.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {columns}"
+            )
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(hashtext($1))", name)
+
+
 async def _init_connection(conn) -> None:
     await conn.set_type_codec(
         "json",
@@ -48,6 +78,13 @@ async def lifespan(app: FastAPI):
         cache_logger_on_first_use=True,
     )
 
+    # Sync endpoints, run_in_threadpool calls and upload spooling share anyio's
+    # threadpool. Password hashing has its own pool, so this only needs raising
+    # above anyio's default of 40 for hosts with more blocking work.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = int(
+        os.environ.get("THREADPOOL_SIZE", "40")
+    )
+
     global _pg_pool
 
     _pg_pool = await asyncpg.create_pool(
@@ -59,6 +96,20 @@ async def lifespan(app: FastAPI):
         init=_init_connection,
     )
     await AsyncPostgresCheckpoint().ensure_setup()
+
+    # app.memory imports this module, so it can only be imported here.
+    from app.memory import (
+        ensure_memory_index,
+        start_memory_workers,
+        stop_memory_workers,
+    )
+    from app.upload import PG_ENGINE, ensure_content_hash_index
+
+    await ensure_content_hash_index()
+    await ensure_memory_index()
+    start_memory_workers()
     yield
+    await stop_memory_workers()
+    PG_ENGINE.dispose()
     await _pg_pool.close()
     _pg_pool = None
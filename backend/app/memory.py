@@ -1,15 +1,56 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 from datetime import datetime, timezone
 from typing import Optional, Sequence
 
+import structlog
 from langchain_core.documents import Document
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from starlette.concurrency import run_in_threadpool
 
-from app.lifespan import get_pg_pool
+from app.lifespan import create_index_concurrently, get_pg_pool
 from app.upload import _collection_name, vstore
 
+logger = structlog.get_logger(__name__)
+
 MEMORY_SOURCE = "memory"
+MEMORY_QUEUE_SIZE = 10_000
+MEMORY_WORKERS = 4
+MEMORY_BATCH_SIZE = 64
+MEMORY_FLUSH_INTERVAL = 0.5
+
+# Chat turns that carry nothing worth retrieving memory for. Compared after
+# lowercasing and stripping surrounding punctuation.
+_STOP_PHRASES = frozenset(
+    {
+        "hi",
+        "hello",
+        "hey",
+        "ok",
+        "okay",
+        "k",
+        "yes",
+        "no",
+        "yep",
+        "nope",
+        "sure",
+        "thanks",
+        "thank you",
+        "thx",
+        "cool",
+        "great",
+        "nice",
+        "got it",
+        "continue",
+        "go on",
+    }
+)
+_MIN_MEMORY_QUERY_CHARS = 4
+
+_memory_queue: Optional[asyncio.Queue] = None
+_memory_workers: list[asyncio.Task] = []
 
 
 def memory_namespace(user_id: str) -> str:
@@ -37,13 +78,13 @@ def _build_memory_document(
     return Document(page_content=text, metadata=metadata)
 
 
-def store_memory_messages(
+def memory_message_documents(
     *,
     messages: Sequence[BaseMessage],
     user_id: str,
     thread_id: Optional[str],
     assistant_id: Optional[str],
-) -> None:
+) -> list[Document]:
     docs: list[Document] = []
     for message in messages:
         content = message.content
@@ -71,6 +112,42 @@ def store_memory_messages(
                     role="assistant",
                 )
             )
+    return docs
+
+
+def user_message_documents(
+    *,
+    user_id: str,
+    content: str,
+    thread_id: Optional[str],
+    assistant_id: Optional[str],
+) -> list[Document]:
+    if not content or not content.strip():
+        return []
+    return [
+        _build_memory_document(
+            content=f"User: {content}",
+            user_id=user_id,
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            role="user",
+        )
+    ]
+
+
+def store_memory_messages(
+    *,
+    messages: Sequence[BaseMessage],
+    user_id: str,
+    thread_id: Optional[str],
+    assistant_id: Optional[str],
+) -> None:
+    docs = memory_message_documents(
+        messages=messages,
+        user_id=user_id,
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+    )
     if docs:
         vstore.add_documents(docs)
 
@@ -82,18 +159,112 @@ def store_user_message(
     thread_id: Optional[str],
     assistant_id: Optional[str],
 ) -> None:
-    if not content or not content.strip():
-        return
-    doc = _build_memory_document(
-        content=f"User: {content}",
+    docs = user_message_documents(
         user_id=user_id,
+        content=content,
         thread_id=thread_id,
         assistant_id=assistant_id,
-        role="user",
     )
-    vstore.add_documents([doc])
+    if docs:
+        vstore.add_documents(docs)
+
+
+async def _next_batch(queue: asyncio.Queue) -> list[Document]:
+    """Wait for a document, then gather more for up to the flush interval."""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + MEMORY_FLUSH_INTERVAL
+    while len(batch) < MEMORY_BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+async def _memory_worker(queue: asyncio.Queue) -> None:
+    while True:
+        batch = await _next_batch(queue)
+        try:
+            # Documents carry their own namespace in metadata, so one call
+            # covers every user in the batch: one embedding request, one insert.
+            await run_in_threadpool(vstore.add_documents, batch)
+        except Exception:
+            logger.exception("Memory write failed", documents=len(batch))
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+def start_memory_workers(num_workers: int = MEMORY_WORKERS) -> None:
+    """Start the workers that apply queued memory writes."""
+    global _memory_queue
+
+    _memory_queue = asyncio.Queue(maxsize=MEMORY_QUEUE_SIZE)
+    _memory_workers.extend(
+        asyncio.create_task(_memory_worker(_memory_queue)) for _ in range(num_workers)
+    )
+
+
+async def flush_memory_writes() -> None:
+    """Wait until every queued memory write has been applied."""
+    if _memory_queue is not None:
+        await _memory_queue.join()
+
+
+async def stop_memory_workers() -> None:
+    """Drain pending memory writes, then stop the workers."""
+    global _memory_queue
+
+    await flush_memory_writes()
+    for worker in _memory_workers:
+        worker.cancel()
+    await asyncio.gather(*_memory_workers, return_exceptions=True)
+    _memory_workers.clear()
+    _memory_queue = None
+
+
+async def enqueue_memory_documents(docs: Sequence[Document]) -> None:
+    """Queue memory documents to be embedded and stored in batches.
+
+    Waits for room when the queue is full. Without running workers the
+    documents are stored in the threadpool straight away.
+    """
+    if not docs:
+        return
+    if _memory_queue is None:
+        await run_in_threadpool(vstore.add_documents, list(docs))
+        return
+    for doc in docs:
+        await _memory_queue.put(doc)
+
+
+async def ensure_memory_index() -> None:
+    """Index the memory listing query.
+
+    langchain_pg_embedding is created by PGVector rather than by migrations, so
+    the index is created here at startup, concurrently so writes are not
+    blocked. created_at is stored as a UTC isoformat string, which sorts
+    chronologically as text.
+    """
+    await create_index_concurrently(
+        "idx_langchain_pg_embedding_memory_created_at",
+        "langchain_pg_embedding",
+        """
+        (
+            collection_id,
+            (cmetadata->>'source'),
+            (cmetadata->>'user_id'),
+            (cmetadata->>'created_at') DESC
+        )
+        """,
+    )
 
 
+@functools.lru_cache(maxsize=1024)
 def get_memory_retriever(user_id: str, *, k: int = 4):
     return vstore.as_retriever(
         search_kwargs={
@@ -113,7 +284,8 @@ async def build_memory_context(
     max_items: int = 4,
     max_chars: int = 1200,
 ) -> Optional[str]:
-    if not query or not query.strip():
+    normalized = query.strip().strip(".!?,").lower() if query else ""
+    if len(normalized) < _MIN_MEMORY_QUERY_CHARS or normalized in _STOP_PHRASES:
         return None
     retriever = get_memory_retriever(user_id, k=max_items)
     docs = await retriever.ainvoke(query)
@@ -139,25 +311,45 @@ async def list_user_memory(
     *,
     user_id: str,
     limit: int = 100,
-    offset: int = 0,
+    before: Optional[tuple[Optional[str], str]] = None,
 ) -> list[dict]:
+    """List a user's memories, newest first.
+
+    Pages are keyset paginated: pass the (created_at, id) of the last item of
+    the previous page as before. Rows without created_at, written before it
+    was recorded, sort first, as in the created_at index.
+    """
+    params: list = [_collection_name(), MEMORY_SOURCE, user_id, limit]
+    keyset = ""
+    if before is not None and before[0] is None:
+        # Still within the rows without created_at; every dated row follows.
+        keyset = """
+              AND (e.cmetadata->>'created_at' IS NOT NULL OR e.uuid < $5::uuid)
+        """
+        params.append(before[1])
+    elif before is not None:
+        # The redundant <= bound lets the created_at index range-scan instead
+        # of filtering every newer row. It also drops the undated rows, which
+        # were all listed before the first dated one.
+        keyset = """
+              AND e.cmetadata->>'created_at' <= $5
+              AND (e.cmetadata->>'created_at' < $5 OR e.uuid < $6::uuid)
+        """
+        params.extend(before)
     async with get_pg_pool().acquire() as conn:
         rows = await conn.fetch(
-            """
+            f"""
             SELECT e.uuid, e.document, e.cmetadata
             FROM langchain_pg_embedding e
             JOIN langchain_pg_collection c ON e.collection_id = c.uuid
             WHERE c.name = $1
               AND e.cmetadata->>'source' = $2
               AND e.cmetadata->>'user_id' = $3
-            ORDER BY e.cmetadata->>'created_at' DESC
-            LIMIT $4 OFFSET $5
+              {keyset}
+            ORDER BY e.cmetadata->>'created_at' DESC NULLS FIRST, e.uuid DESC
+            LIMIT $4
             """,
-            _collection_name(),
-            MEMORY_SOURCE,
-            user_id,
-            limit,
-            offset,
+            *params,
         )
     items: list[dict] = []
     for row in rows:
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class User(BaseModel):
@@ -11,6 +11,8 @@ class User(BaseModel):
     """The sub of the user (from a JWT token)."""
     created_at: datetime
     """The time the user was created."""
+    tokens_not_before: Optional[datetime] = Field(default=None, exclude=True)
+    """Tokens issued before this time are rejected. Set on logout."""
 
 
 class Assistant(BaseModel):
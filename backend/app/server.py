@@ -1,9 +1,14 @@
+import asyncio
+import functools
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 import orjson
 import structlog
-from fastapi import BackgroundTasks, FastAPI, Form, HTTPException, UploadFile
+from fastapi import FastAPI, Form, HTTPException, UploadFile
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 import app.storage as storage
@@ -18,11 +23,28 @@ from app.ingest_jobs import (
     update_progress,
 )
 from app.lifespan import lifespan
-from app.upload import convert_ingestion_input_to_blob, ingest_runnable
+from app.upload import convert_ingestion_input_to_blob, discard_blob, ingest_runnable
 
 logger = structlog.get_logger(__name__)
 
-app = FastAPI(title="OpenGPTs API", lifespan=lifespan)
+# Ingestion runs on its own bounded pool rather than the request threadpool,
+# so large uploads cannot crowd out API traffic.
+_INGEST_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("INGEST_WORKERS", "4")),
+    thread_name_prefix="ingest",
+)
+# Files of one job ingested at once, so a large upload leaves workers free
+# for other jobs.
+_INGEST_FILES_PER_JOB = 4
+
+# Strong references to running ingest jobs, so they are not garbage collected.
+_ingest_tasks: set[asyncio.Task] = set()
+
+app = FastAPI(
+    title="OpenGPTs API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 # Get root of app, used to point to directory containing static files
@@ -36,68 +58,123 @@ app.include_router(api_router)
 async def ingest_files(
     files: list[UploadFile],
     user: AuthedUser,
-    background_tasks: BackgroundTasks,
     config: str = Form(...),
 ) -> None:
     """Ingest a list of files."""
-    config = orjson.loads(config)
+    configurable = orjson.loads(config)["configurable"]
 
-    assistant_id = config["configurable"].get("assistant_id")
+    assistant_id = configurable.get("assistant_id")
     if assistant_id is not None:
         assistant = await storage.get_assistant(user.user_id, assistant_id)
         if assistant is None:
             raise HTTPException(status_code=404, detail="Assistant not found.")
 
-    thread_id = config["configurable"].get("thread_id")
+    thread_id = configurable.get("thread_id")
     if thread_id is not None:
         thread = await storage.get_thread(user.user_id, thread_id)
         if thread is None:
             raise HTTPException(status_code=404, detail="Thread not found.")
 
-    file_entries = [convert_ingestion_input_to_blob(file) for file in files]
+    # Uploads are copied concurrently; on any failure the others are still
+    # awaited so their temporary files can be removed.
+    results = await asyncio.gather(
+        *(convert_ingestion_input_to_blob(file) for file in files),
+        return_exceptions=True,
+    )
+    file_entries = [entry for entry in results if not isinstance(entry, BaseException)]
+    if len(file_entries) < len(results):
+        for blob, _ in file_entries:
+            discard_blob(blob)
+        raise next(entry for entry in results if isinstance(entry, BaseException))
     file_blobs = [entry[0] for entry in file_entries]
     total_bytes = sum(entry[1] for entry in file_entries)
 
-    job = create_job(total_bytes)
+    job = await create_job(total_bytes)
+    # Only the ids are needed for ingestion, so the job does not hold on to
+    # the rest of the submitted config.
+    ingest_config = {
+        "configurable": {"assistant_id": assistant_id, "thread_id": thread_id}
+    }
 
-    def run_ingest_job() -> None:
+    async def run_ingest_job() -> None:
+        loop = asyncio.get_running_loop()
+        file_slots = asyncio.Semaphore(_INGEST_FILES_PER_JOB)
+        progress_lock = threading.Lock()
         processed_bytes = 0
+        canceled = False
+        failed = False
+
+        def on_update(future: "Future[bool]") -> None:
+            nonlocal canceled
+            if not future.cancelled() and future.exception() is None:
+                canceled = canceled or not future.result()
 
+        # Progress and cancel callbacks run on the ingest threads. Progress is
+        # written through the event loop, and a write that finds the job no
+        # longer running is how a cancel from any API worker is noticed.
         def on_progress(delta_bytes: int) -> None:
             nonlocal processed_bytes
-            processed_bytes += delta_bytes
-            update_progress(job.job_id, processed_bytes)
-
+            with progress_lock:
+                processed_bytes += delta_bytes
+                total = processed_bytes
+            asyncio.run_coroutine_threadsafe(
+                update_progress(job.job_id, total), loop
+            ).add_done_callback(on_update)
+
+        # A failed file also stops the others, since the job fails as a whole.
         def should_cancel() -> bool:
-            current_job = get_job(job.job_id)
-            return current_job is not None and current_job.status == "canceled"
+            return canceled or failed
+
+        async def ingest(blob) -> None:
+            nonlocal failed
+            async with file_slots:
+                if should_cancel():
+                    return
+                try:
+                    await loop.run_in_executor(
+                        _INGEST_EXECUTOR,
+                        functools.partial(
+                            ingest_runnable.invoke,
+                            blob,
+                            ingest_config,
+                            progress_callback=on_progress,
+                            should_cancel=should_cancel,
+                        ),
+                    )
+                except Exception:
+                    failed = True
+                    raise
 
         try:
-            current_job = get_job(job.job_id)
+            current_job = await get_job(job.job_id)
             if current_job and current_job.status == "canceled":
                 return
-            for blob in file_blobs:
-                current_job = get_job(job.job_id)
-                if current_job and current_job.status == "canceled":
-                    return
-                ingest_runnable.invoke(
-                    blob,
-                    config,
-                    progress_callback=on_progress,
-                    should_cancel=should_cancel,
-                )
-            mark_done(job.job_id)
+            # Files are independent, so they are ingested concurrently. Every
+            # file is awaited before cleanup, even after a failure.
+            results = await asyncio.gather(
+                *(ingest(blob) for blob in file_blobs), return_exceptions=True
+            )
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                raise errors[0]
+            if not canceled:
+                await mark_done(job.job_id)
         except Exception as exc:
             logger.exception("Ingest job failed", job_id=job.job_id)
-            mark_error(job.job_id, str(exc))
+            await mark_error(job.job_id, str(exc))
+        finally:
+            for blob in file_blobs:
+                discard_blob(blob)
 
-    background_tasks.add_task(run_ingest_job)
+    task = asyncio.create_task(run_ingest_job())
+    _ingest_tasks.add(task)
+    task.add_done_callback(_ingest_tasks.discard)
     return {"job_id": job.job_id, "status": job.status}
 
 
 @app.get("/ingest/{job_id}", description="Get file ingestion status.")
 async def ingest_status(job_id: str) -> dict:
-    job = get_job(job_id)
+    job = await get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Ingest job not found.")
     return {
@@ -110,7 +187,7 @@ async def ingest_status(job_id: str) -> dict:
 
 @app.post("/ingest/{job_id}/cancel", description="Cancel file ingestion.")
 async def ingest_cancel(job_id: str) -> dict:
-    if not cancel_job(job_id):
+    if not await cancel_job(job_id):
         raise HTTPException(status_code=409, detail="Ingest job cannot be canceled.")
     return {"job_id": job_id, "status": "canceled"}
 
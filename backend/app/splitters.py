@@ -0,0 +1,110 @@
+"""Text splitters used for ingestion."""
+
+from typing import Any, List
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+try:
+    from semantic_text_splitter import TextSplitter as _SemanticTextSplitter
+except ImportError:
+    _SemanticTextSplitter = None
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Neighbouring chunks are merged while the result stays within this factor of
+# the chunk size, and chunks shorter than MIN_CHUNK_SIZE are always merged.
+MERGE_FACTOR = 1.15
+MIN_CHUNK_SIZE = 100
+
+
+def merge_small_chunks(
+    text: str, chunks: List[str], *, max_size: int, min_size: int = MIN_CHUNK_SIZE
+) -> List[str]:
+    """Merge neighbouring chunks of text into fewer, fuller ones.
+
+    Chunks are located in text and merged by span, so overlapping chunks do
+    not repeat the overlap. Chunks that cannot be located are left as is.
+    """
+    spans = []
+    search_from = 0
+    for chunk in chunks:
+        start = text.find(chunk, search_from)
+        if start < 0:
+            return chunks
+        spans.append((start, start + len(chunk)))
+        search_from = start + 1
+    if len(spans) < 2:
+        return chunks
+
+    merged = [spans[0]]
+    for start, end in spans[1:]:
+        merged_start, merged_end = merged[-1]
+        if (
+            end - merged_start <= max_size
+            or merged_end - merged_start < min_size
+            or end - start < min_size
+        ):
+            merged[-1] = (merged_start, max(merged_end, end))
+        else:
+            merged.append((start, end))
+    if len(merged) == len(spans):
+        return chunks
+    return [text[start:end] for start, end in merged]
+
+
+class SplitThenMergeTextSplitter(RecursiveCharacterTextSplitter):
+    """RecursiveCharacterTextSplitter that merges small neighbouring chunks.
+
+    Each chunk costs an embedding and a row, so paragraph tails are folded
+    into their neighbours instead of being stored on their own.
+    """
+
+    def split_text(self, text: str) -> List[str]:
+        return merge_small_chunks(
+            text,
+            super().split_text(text),
+            max_size=int(MERGE_FACTOR * self._chunk_size),
+        )
+
+
+class SemanticTextSplitter(TextSplitter):
+    """TextSplitter backed by the Rust semantic-text-splitter package.
+
+    Chunks are filled to between chunk_size - chunk_overlap and chunk_size
+    characters, splitting on the largest semantic unit that fits.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+        **kwargs: Any,
+    ) -> None:
+        if _SemanticTextSplitter is None:
+            raise ImportError(
+                "semantic-text-splitter is not installed. "
+                "Install it with `pip install semantic-text-splitter`."
+            )
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self._splitter = _SemanticTextSplitter(
+            (chunk_size - chunk_overlap, chunk_size), overlap=chunk_overlap
+        )
+
+    def split_text(self, text: str) -> List[str]:
+        return merge_small_chunks(
+            text,
+            self._splitter.chunks(text),
+            max_size=int(MERGE_FACTOR * self._chunk_size),
+        )
+
+
+def default_text_splitter() -> TextSplitter:
+    """The Rust splitter when it is installed, else LangChain's recursive one.
+
+    Either way, small neighbouring chunks are merged after splitting.
+    """
+    if _SemanticTextSplitter is not None:
+        return SemanticTextSplitter()
+    return SplitThenMergeTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
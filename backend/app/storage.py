@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
 from typing import Any, List, Optional, Sequence, Union
 
+from cachetools import TTLCache
 from langchain_core.messages import AnyMessage
 from langchain_core.runnables import RunnableConfig
 
@@ -8,6 +9,12 @@ from app.agent import agent
 from app.lifespan import get_pg_pool
 from app.schema import Assistant, Thread, User
 
+# Users by sub for callers that do not need the password hash. Invalidated by
+# the functions below that change or remove a user row, but only in this
+# process: other workers may still see a deleted user for up to the TTL, the
+# same bound as the auth token cache.
+_user_by_sub_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
 
 async def list_assistants(user_id: str) -> List[Assistant]:
     """List all assistants for the current user."""
@@ -274,6 +281,23 @@ async def get_user_by_sub(sub: str) -> Optional[dict]:
         return dict(record) if record else None
 
 
+async def get_user_by_sub_light(sub: str) -> Optional[User]:
+    """Get a user by sub without the password hash, cached for 30 seconds."""
+    if (user := _user_by_sub_cache.get(sub)) is not None:
+        return user
+    async with get_pg_pool().acquire() as conn:
+        record = await conn.fetchrow(
+            'SELECT user_id, sub, created_at, tokens_not_before FROM "user" '
+            "WHERE sub = $1",
+            sub,
+        )
+    if record is None:
+        return None
+    user = User(**record)
+    _user_by_sub_cache[sub] = user
+    return user
+
+
 async def create_user_with_password(sub: str, password_hash: str) -> User:
     async with get_pg_pool().acquire() as conn:
         record = await conn.fetchrow(
@@ -281,6 +305,7 @@ async def create_user_with_password(sub: str, password_hash: str) -> User:
             sub,
             password_hash,
         )
+        _user_by_sub_cache.pop(sub, None)
         return User(**record)
 
 
@@ -291,9 +316,21 @@ async def set_user_password(user_id: str, password_hash: str) -> User:
             password_hash,
             user_id,
         )
+        _user_by_sub_cache.pop(record["sub"], None)
         return User(**record)
 
 
+async def revoke_user_tokens(sub: str) -> None:
+    """Reject every token issued to the user before now."""
+    async with get_pg_pool().acquire() as conn:
+        await conn.execute(
+            'UPDATE "user" SET tokens_not_before = $1 WHERE sub = $2',
+            datetime.now(timezone.utc),
+            sub,
+        )
+    _user_by_sub_cache.pop(sub, None)
+
+
 async def delete_user_data(user_id: str) -> None:
     async with get_pg_pool().acquire() as conn:
         async with conn.transaction():
@@ -309,4 +346,8 @@ async def delete_user_data(user_id: str) -> None:
                 )
             await conn.execute("DELETE FROM thread WHERE user_id = $1", user_id)
             await conn.execute("DELETE FROM assistant WHERE user_id = $1", user_id)
-            await conn.execute('DELETE FROM "user" WHERE user_id = $1', user_id)
+            sub = await conn.fetchval(
+                'DELETE FROM "user" WHERE user_id = $1 RETURNING sub', user_id
+            )
+    if sub is not None:
+        _user_by_sub_cache.pop(sub, None)
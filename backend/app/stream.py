@@ -1,4 +1,5 @@
 import functools
+import re
 from typing import (
     Any,
     AsyncIterator,
@@ -44,24 +45,66 @@ def _message_to_text(message: BaseMessage) -> str:
     content = message.content
     if isinstance(content, str):
         return content
-    return orjson.dumps(content).decode()
+    # Multimodal content is a list of str and {"type": "text", "text": ...}
+    # parts; only other shapes need the JSON fallback.
+    texts = []
+    for part in content:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            texts.append(part.get("text") or "")
+        else:
+            return orjson.dumps(content).decode()
+    return "".join(texts)
 
 
-def _estimate_usage(messages: dict[str, BaseMessage]) -> Optional[dict]:
-    ai_messages = [msg for msg in messages.values() if isinstance(msg, AIMessage)]
-    if not ai_messages:
-        return None
-    last_ai = ai_messages[-1]
-    prompt_text = "\n".join(
-        _message_to_text(msg) for msg in messages.values() if msg is not last_ai
-    )
-    completion_text = _message_to_text(last_ai)
+@functools.lru_cache(maxsize=1)
+def _tiktoken_encoder() -> tiktoken.Encoding:
     try:
-        encoder = tiktoken.encoding_for_model("gpt-4o")
+        return tiktoken.encoding_for_model("gpt-4o")
     except Exception:
-        encoder = tiktoken.get_encoding("cl100k_base")
-    prompt_tokens = len(encoder.encode(prompt_text)) if prompt_text else 0
-    completion_tokens = len(encoder.encode(completion_text)) if completion_text else 0
+        return tiktoken.get_encoding("cl100k_base")
+
+
+TokenCounts = dict[str, tuple[BaseMessage, int]]
+
+
+def _count_tokens(
+    msg_id: str, message: BaseMessage, token_counts: TokenCounts, exact: bool
+) -> int:
+    """
+    Token count for a message, reused while the same message object is seen.
+    Without exact, tokens are approximated as one per four characters.
+    """
+    cached = token_counts.get(msg_id)
+    if cached is not None and cached[0] is message:
+        return cached[1]
+    text = _message_to_text(message)
+    if not text:
+        count = 0
+    elif exact:
+        count = len(_tiktoken_encoder().encode(text))
+    else:
+        count = (len(text) + 3) // 4
+    token_counts[msg_id] = (message, count)
+    return count
+
+
+def _estimate_usage(
+    messages: dict[str, BaseMessage], token_counts: TokenCounts, exact: bool = False
+) -> Optional[dict]:
+    ai_ids = [msg_id for msg_id, msg in messages.items() if isinstance(msg, AIMessage)]
+    if not ai_ids:
+        return None
+    last_ai_id = ai_ids[-1]
+    prompt_tokens = sum(
+        _count_tokens(msg_id, msg, token_counts, exact)
+        for msg_id, msg in messages.items()
+        if msg_id != last_ai_id
+    )
+    completion_tokens = _count_tokens(
+        last_ai_id, messages[last_ai_id], token_counts, exact
+    )
     total_tokens = prompt_tokens + completion_tokens
     return {
         "prompt_tokens": prompt_tokens,
@@ -71,15 +114,31 @@ def _estimate_usage(messages: dict[str, BaseMessage]) -> Optional[dict]:
     }
 
 
+def _content_length(message: Union[AnyMessage, Dict[str, Any]]) -> int:
+    """Cheap fingerprint used to skip full comparisons of changed messages."""
+    content = message.get("content") if isinstance(message, dict) else message.content
+    return len(content) if isinstance(content, (str, list)) else -1
+
+
 async def astream_state(
     app: Runnable,
     input: Union[Sequence[AnyMessage], Dict[str, Any]],
     config: RunnableConfig,
     on_complete: Optional[Callable[[Sequence[BaseMessage]], Awaitable[None]]] = None,
+    *,
+    exact_usage_estimate: bool = False,
 ) -> MessagesStream:
-    """Stream messages from the runnable."""
+    """
+    Stream messages from the runnable.
+
+    Usage is estimated only until the model reports real usage. Estimates
+    use a character count unless exact_usage_estimate asks for tiktoken.
+    """
     root_run_id: Optional[str] = None
     messages: dict[str, BaseMessage] = {}
+    content_lengths: dict[str, int] = {}
+    token_counts: TokenCounts = {}
+    usage_reported = False
 
     async for event in app.astream_events(
         input, config, version="v1", stream_mode="values", exclude_tags=["nostream"]
@@ -99,11 +158,18 @@ async def astream_state(
 
             for msg in state_chunk_msgs:
                 msg_id = msg["id"] if isinstance(msg, dict) else msg.id
-                if msg_id in messages and msg == messages[msg_id]:
-                    continue
-                else:
-                    messages[msg_id] = msg
-                    new_messages.append(msg)
+                # A message whose content length changed is new; only when the
+                # lengths match is the full comparison needed.
+                content_length = _content_length(msg)
+                if msg_id in messages:
+                    known_length = content_lengths.get(msg_id)
+                    if known_length is None:
+                        known_length = _content_length(messages[msg_id])
+                    if known_length == content_length and msg == messages[msg_id]:
+                        continue
+                messages[msg_id] = msg
+                content_lengths[msg_id] = content_length
+                new_messages.append(msg)
             if new_messages:
                 yield new_messages
         elif event["event"] == "on_chat_model_stream":
@@ -112,11 +178,14 @@ async def astream_state(
                 messages[message.id] = message
             else:
                 messages[message.id] += message
+            content_lengths.pop(message.id, None)
             yield [messages[message.id]]
         elif event["event"] in ("on_chat_model_end", "on_llm_end"):
             usage = _extract_usage(event["data"])
-            if not usage:
-                usage = _estimate_usage(messages)
+            if usage:
+                usage_reported = True
+            elif not usage_reported:
+                usage = _estimate_usage(messages, token_counts, exact_usage_estimate)
             if usage:
                 yield {"event": "usage", "data": usage}
 
@@ -125,49 +194,71 @@ async def astream_state(
 
 
 def _default(obj) -> Any:
+    # Messages are pydantic v2 models, where .dict() is a deprecated wrapper
+    # that warns on every call, so model_dump is tried first.
+    model_dump = getattr(obj, "model_dump", None)
+    if model_dump is not None:
+        return model_dump()
     if hasattr(obj, "dict") and callable(obj.dict):
         return obj.dict()
     raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
 
-dumps = functools.partial(orjson.dumps, default=_default)
+dumps = functools.partial(
+    orjson.dumps, default=_default, option=orjson.OPT_SERIALIZE_NUMPY
+)
+
+
+# Frames are built as bytes and handed to EventSourceResponse as-is. orjson
+# never emits raw newlines, so each payload fits on a single data line.
+_SSE_SEP = b"\r\n"
+_DATA_FRAME_PREFIX = b"event: data" + _SSE_SEP + b"data: "
+_METADATA_FRAME_PREFIX = b"event: metadata" + _SSE_SEP + b"data: "
+_FRAME_SUFFIX = _SSE_SEP + _SSE_SEP
+
+
+# Run ids are UUID strings, which need no JSON escaping.
+_RUN_ID_RE = re.compile(r"[0-9a-fA-F-]+")
+
+
+def _sse_frame(event: str, data: bytes) -> bytes:
+    return b"event: " + event.encode() + _SSE_SEP + b"data: " + data + _FRAME_SUFFIX
+
+
+def _metadata_frame(run_id: str) -> bytes:
+    if _RUN_ID_RE.fullmatch(run_id):
+        data = b'{"run_id":"' + run_id.encode() + b'"}'
+    else:
+        data = orjson.dumps({"run_id": run_id})
+    return _METADATA_FRAME_PREFIX + data + _FRAME_SUFFIX
+
+
+_ERROR_FRAME = _sse_frame(
+    "error", orjson.dumps({"status_code": 500, "message": "Internal Server Error"})
+)
+_END_FRAME = b"event: end" + _FRAME_SUFFIX
 
 
-async def to_sse(messages_stream: MessagesStream) -> AsyncIterator[dict]:
+async def to_sse(messages_stream: MessagesStream) -> AsyncIterator[bytes]:
     """Consume the stream into an EventSourceResponse"""
     try:
         async for chunk in messages_stream:
-            # EventSourceResponse expects a string for data
-            # so after serializing into bytes, we decode into utf-8
-            # to get a string.
             if isinstance(chunk, dict) and "event" in chunk and "data" in chunk:
-                yield {
-                    "event": chunk["event"],
-                    "data": orjson.dumps(chunk["data"]).decode(),
-                }
+                yield _sse_frame(chunk["event"], orjson.dumps(chunk["data"]))
             elif isinstance(chunk, str):
-                yield {
-                    "event": "metadata",
-                    "data": orjson.dumps({"run_id": chunk}).decode(),
-                }
+                yield _metadata_frame(chunk)
             else:
-                yield {
-                    "event": "data",
-                    "data": dumps(
-                        [message_chunk_to_message(msg) for msg in chunk]
-                    ).decode(),
-                }
+                yield (
+                    _DATA_FRAME_PREFIX
+                    + dumps([message_chunk_to_message(msg) for msg in chunk])
+                    + _FRAME_SUFFIX
+                )
     except Exception:
         logger.warn("error in stream", exc_info=True)
-        yield {
-            "event": "error",
-            # Do not expose the error message to the client since
-            # the message may contain sensitive information.
-            # We'll add client side errors for validation as well.
-            "data": orjson.dumps(
-                {"status_code": 500, "message": "Internal Server Error"}
-            ).decode(),
-        }
+        # Do not expose the error message to the client since
+        # the message may contain sensitive information.
+        # We'll add client side errors for validation as well.
+        yield _ERROR_FRAME
 
     # Send an end event to signal the end of the stream
-    yield {"event": "end"}
+    yield _END_FRAME
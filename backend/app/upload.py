@@ -9,10 +9,15 @@ For the time being, upload and ingestion are coupled
 
 from __future__ import annotations
 
+import functools
 import mimetypes
 import os
-from typing import BinaryIO, Callable, List, Optional
+import tempfile
+import uuid
+from typing import Any, BinaryIO, Callable, Iterable, List, Optional, Set, Tuple
 
+import orjson
+import sqlalchemy
 from fastapi import UploadFile
 from langchain_community.vectorstores.pgvector import PGVector
 from langchain_core.document_loaders.blob_loaders import Blob
@@ -22,19 +27,92 @@ from langchain_core.runnables import (
     RunnableSerializable,
 )
 from langchain_core.vectorstores import VectorStore
-from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+from langchain_text_splitters import TextSplitter
+from psycopg2.extras import execute_values
 from pydantic import ConfigDict
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.embeddings import get_embeddings_client
+from app.embeddings import (
+    EMBEDDINGS_CHUNK_SIZE,
+    EMBEDDINGS_CONFIG,
+    get_embeddings_client,
+)
 from app.ingest import ingest_blob
-from app.parsing import MIMETYPE_BASED_PARSER
+from app.lifespan import create_index_concurrently
+from app.parsing import HANDLERS, MIMETYPE_BASED_PARSER
+from app.splitters import default_text_splitter
+
+# Uploads larger than this are spooled to disk instead of held in memory.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+_COPY_CHUNK_BYTES = 1024 * 1024
+# Leading bytes of an upload that mimetype sniffing looks at.
+_SNIFF_BYTES = 4096
+# Rows sent per INSERT statement when writing embeddings.
+_INSERT_PAGE_SIZE = 500
+# Column types embeddings can be stored as; see BatchedPGVector.
+_EMBEDDING_STORAGE_TYPES = ("vector", "halfvec")
+# Chunks and characters gathered for one indexing batch. OpenAI batches hold
+# enough 1000-character chunks to fill an embeddings request; the local TEI
+# server keeps the original small batches.
+_OPENAI_MAX_BATCH_CHARS = EMBEDDINGS_CHUNK_SIZE * 1000
+_LOCAL_BATCH_SIZE = 5
+_LOCAL_MAX_BATCH_CHARS = 50_000
+
+# Extensions checked before mimetypes: the common upload types, and .gpx,
+# which mimetypes does not know.
+_EXTENSION_TYPES = {
+    ".gpx": "application/gpx+xml",
+    ".pdf": "application/pdf",
+    ".docx": (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    ),
+    ".csv": "text/csv",
+    ".txt": "text/plain",
+}
+
+_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# File signatures grouped by their first byte, so only candidates that can
+# match are tested.
+_SIGNATURES: dict[bytes, list[tuple[bytes, str]]] = {
+    b"%": [(b"%PDF", "application/pdf")],
+    b"\x50": [
+        (b"\x50\x4b\x03\x04", _XLSX),
+        (b"\x50\x4b\x05\x06", _XLSX),
+        (b"\x50\x4b\x07\x08", _XLSX),
+    ],
+    b"\xd0": [(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword")],
+    b"\x09": [(b"\x09\x00\xff\x00\x06\x00", "application/vnd.ms-excel")],
+}
+
+# Bytes that can appear in text: printable ASCII, the whitespace of ordinary
+# text files, and every non-ASCII byte, which may be part of a UTF-8 sequence.
+_TEXT_BYTES = bytes(
+    b for b in range(256) if b >= 0x80 or chr(b).isprintable() or b in b"\t\n\r"
+)
+_TEXT_WHITESPACE = str.maketrans("", "", "\t\n\r")
+
+
+def _looks_like_text(prefix: bytes) -> bool:
+    """Whether prefix is printable text, allowing tabs and line breaks."""
+    # Any byte left after deleting the text bytes is an ASCII control byte.
+    if prefix.translate(None, _TEXT_BYTES):
+        return False
+    # Only non-ASCII text needs decoding to check its characters.
+    return (
+        prefix.isascii()
+        or prefix.decode("utf-8", errors="ignore")
+        .translate(_TEXT_WHITESPACE)
+        .isprintable()
+    )
 
 
 def _guess_mimetype(file_name: str, file_bytes: bytes) -> str:
-    """Guess the mime-type of a file based on its name or bytes."""
-    if file_name.lower().endswith(".gpx"):
-        return "application/gpx+xml"
+    """Guess the mime-type of a file based on its name or leading bytes."""
+    # Common extensions are resolved without going through mimetypes
+    extension_type = _EXTENSION_TYPES.get(os.path.splitext(file_name)[1].lower())
+    if extension_type:
+        return extension_type
 
     # Guess based on the file extension
     mime_type, _ = mimetypes.guess_type(file_name)
@@ -44,91 +122,243 @@ def _guess_mimetype(file_name: str, file_bytes: bytes) -> str:
         return mime_type
 
     # Signature-based detection for common types
-    if file_bytes.startswith(b"%PDF"):
-        return "application/pdf"
-    elif file_bytes.startswith(
-        (b"\x50\x4B\x03\x04", b"\x50\x4B\x05\x06", b"\x50\x4B\x07\x08")
-    ):
-        return "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    elif file_bytes.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
-        return "application/msword"
-    elif file_bytes.startswith(b"\x09\x00\xff\x00\x06\x00"):
-        return "application/vnd.ms-excel"
+    for signature, signature_type in _SIGNATURES.get(file_bytes[:1], ()):
+        if file_bytes.startswith(signature):
+            return signature_type
 
     # Check for CSV-like plain text content (commas, tabs, newlines)
-    try:
-        decoded = file_bytes[:1024].decode("utf-8", errors="ignore")
-        if all(char in decoded for char in (",", "\n")) or all(
-            char in decoded for char in ("\t", "\n")
-        ):
-            return "text/csv"
-        elif decoded.isprintable() or decoded == "":
-            return "text/plain"
-    except UnicodeDecodeError:
-        pass
+    prefix = file_bytes[:1024]
+    if b"\n" in prefix and (b"," in prefix or b"\t" in prefix):
+        return "text/csv"
+    if _looks_like_text(prefix):
+        return "text/plain"
 
     return "application/octet-stream"
 
 
-def convert_ingestion_input_to_blob(file: UploadFile) -> tuple[Blob, int]:
-    """Convert ingestion input to blob."""
-    file_data = file.file.read()
+async def convert_ingestion_input_to_blob(file: UploadFile) -> tuple[Blob, int]:
+    """Convert ingestion input to blob.
+
+    Files up to SPOOL_MAX_BYTES are held in memory. Larger ones are streamed
+    to a temporary file that backs the blob; release it with discard_blob.
+    """
     file_name = file.filename
 
     # Check if file_name is a valid string
     if not isinstance(file_name, str):
         raise TypeError(f"Expected string for file name, got {type(file_name)}")
 
-    mimetype = _guess_mimetype(file_name, file_data)
-    blob = Blob.from_data(
-        data=file_data,
-        path=file_name,
+    # When the form parser already knows the upload is large, read only what
+    # sniffing needs instead of buffering SPOOL_MAX_BYTES before spooling.
+    known_large = file.size is not None and file.size > SPOOL_MAX_BYTES
+    head = await file.read(_SNIFF_BYTES if known_large else SPOOL_MAX_BYTES + 1)
+    mimetype = _guess_mimetype(file_name, head[:_SNIFF_BYTES])
+    if not known_large and len(head) <= SPOOL_MAX_BYTES:
+        blob = Blob.from_data(
+            data=head,
+            path=file_name,
+            mime_type=mimetype,
+        )
+        return blob, len(head)
+
+    # Reads go through UploadFile and writes to the threadpool, so copying a
+    # large upload never blocks the event loop.
+    spool = tempfile.NamedTemporaryFile(prefix="upload-", delete=False)
+    try:
+        with spool:
+            await run_in_threadpool(spool.write, head)
+            del head
+            while chunk := await file.read(_COPY_CHUNK_BYTES):
+                await run_in_threadpool(spool.write, chunk)
+            size = spool.tell()
+    except BaseException:
+        os.unlink(spool.name)
+        raise
+    blob = Blob.from_path(
+        spool.name,
         mime_type=mimetype,
+        metadata={"source": file_name},
     )
-    return blob, len(file_data)
+    return blob, size
+
+
+def discard_blob(blob: Blob) -> None:
+    """Remove the temporary file behind a blob from convert_ingestion_input_to_blob."""
+    # Only spooled blobs have no in-memory data; their path is our temp file.
+    if blob.data is None and blob.path:
+        try:
+            os.unlink(blob.path)
+        except FileNotFoundError:
+            pass
+
+
+def _vector_literal(embedding: List[float]) -> str:
+    """Format an embedding in pgvector's text representation."""
+    return "[" + ",".join(map(str, embedding)) + "]"
 
 
+class BatchedPGVector(PGVector):
+    """PGVector that writes embeddings with multi-row INSERT statements.
+
+    The stock implementation builds one ORM object per row; this sends each
+    batch in ceil(n / _INSERT_PAGE_SIZE) statements instead.
+
+    With embedding_storage="halfvec" the embedding column is converted to
+    pgvector's half-precision type, halving the bytes stored and scanned per
+    row. Queries need no change, since their vectors are cast to the column.
+    """
+
+    def __init__(
+        self, *args: Any, embedding_storage: str = "vector", **kwargs: Any
+    ) -> None:
+        if embedding_storage not in _EMBEDDING_STORAGE_TYPES:
+            raise ValueError(
+                f"Unsupported embedding storage {embedding_storage!r}, "
+                f"expected one of {', '.join(_EMBEDDING_STORAGE_TYPES)}"
+            )
+        # Set before PGVector.__init__, which creates the tables.
+        self.embedding_storage = embedding_storage
+        super().__init__(*args, **kwargs)
+
+    def create_tables_if_not_exists(self) -> None:
+        super().create_tables_if_not_exists()
+        with Session(self._bind) as session, session.begin():
+            if self.embedding_storage != "halfvec":
+                return
+            # Every worker runs this at import, so the conversion is serialized,
+            # and workers that waited on the lock find the column converted.
+            session.execute(
+                sqlalchemy.text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+                {"key": "langchain_pg_embedding ddl"},
+            )
+            column_type = session.execute(
+                sqlalchemy.text(
+                    "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                    "WHERE attrelid = 'langchain_pg_embedding'::regclass "
+                    "AND attname = 'embedding'"
+                )
+            ).scalar()
+            if column_type is not None and not column_type.startswith("halfvec"):
+                # Rewrites the table once; later startups find it converted.
+                session.execute(
+                    sqlalchemy.text(
+                        "ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding "
+                        "TYPE halfvec USING embedding::halfvec"
+                    )
+                )
+
+    def known_hashes(self, namespace: str, hashes: List[str]) -> Set[str]:
+        """The given content hashes already stored for namespace."""
+        if not hashes:
+            return set()
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            rows = session.execute(
+                sqlalchemy.text(
+                    "SELECT cmetadata->>'hash' FROM langchain_pg_embedding "
+                    "WHERE collection_id = CAST(:collection_id AS uuid) "
+                    "AND cmetadata->>'namespace' = :namespace "
+                    "AND cmetadata->>'hash' = ANY(:hashes)"
+                ),
+                {
+                    "collection_id": str(collection.uuid),
+                    "namespace": namespace,
+                    "hashes": hashes,
+                },
+            )
+            return {row[0] for row in rows}
+
+    def add_embeddings(
+        self,
+        texts: Iterable[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        if not metadatas:
+            metadatas = [{} for _ in texts]
+
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            collection_id = str(collection.uuid)
+            rows = [
+                (
+                    str(uuid.uuid4()),
+                    collection_id,
+                    _vector_literal(embedding),
+                    text,
+                    orjson.dumps(metadata).decode(),
+                    id_,
+                )
+                for text, metadata, embedding, id_ in zip(
+                    texts, metadatas, embeddings, ids
+                )
+            ]
+            cursor = session.connection().connection.cursor()
+            try:
+                execute_values(
+                    cursor,
+                    "INSERT INTO langchain_pg_embedding "
+                    "(uuid, collection_id, embedding, document, cmetadata, custom_id) "
+                    "VALUES %s",
+                    rows,
+                    template=(
+                        f"(%s::uuid, %s::uuid, %s::{self.embedding_storage}, "
+                        "%s, %s::jsonb, %s)"
+                    ),
+                    page_size=_INSERT_PAGE_SIZE,
+                )
+            finally:
+                cursor.close()
+            session.commit()
+
+        return ids
+
+
+# Derived from settings that are fixed at startup, so computed once.
+@functools.lru_cache(maxsize=1)
 def _collection_name() -> str:
-    provider = os.environ.get("EMBEDDINGS_PROVIDER", "").lower()
-    if provider == "local":
-        model_id = os.environ.get("EMBEDDINGS_MODEL_ID", "local").lower()
-        sanitized = model_id.replace("/", "_").replace(":", "_")
+    config = EMBEDDINGS_CONFIG
+    if config.provider == "local":
+        sanitized = config.local_model_id.replace("/", "_").replace(":", "_")
         return f"opengpts_local_{sanitized}"
-    if os.environ.get("AZURE_OPENAI_API_KEY"):
+    if config.has_azure_key:
         return "opengpts_azure_embeddings"
     return "opengpts_openai_embeddings"
 
 
+def _ingest_batch_limits() -> Tuple[int, int]:
+    """The batch_size and max_batch_chars for ingest_blob."""
+    if EMBEDDINGS_CONFIG.provider == "local":
+        return _LOCAL_BATCH_SIZE, _LOCAL_MAX_BATCH_CHARS
+    return _INSERT_PAGE_SIZE, _OPENAI_MAX_BATCH_CHARS
+
+
+async def ensure_content_hash_index() -> None:
+    """Index the known_hashes lookup, concurrently so writes are not blocked."""
+    await create_index_concurrently(
+        "idx_langchain_pg_embedding_content_hash",
+        "langchain_pg_embedding",
+        "(collection_id, (cmetadata->>'namespace'), (cmetadata->>'hash'))",
+    )
+
+
 def _determine_embeddings() -> PGVector:
-    if os.environ.get("EMBEDDINGS_PROVIDER", "").lower() == "local":
-        return PGVector(
-            connection_string=PG_CONNECTION_STRING,
-            embedding_function=get_embeddings_client(),
-            use_jsonb=True,
-            collection_name=_collection_name(),
-        )
-    if os.environ.get("OPENAI_API_KEY"):
-        return PGVector(
-            connection_string=PG_CONNECTION_STRING,
-            embedding_function=OpenAIEmbeddings(),
-            use_jsonb=True,
-            collection_name=_collection_name(),
-        )
-    if os.environ.get("AZURE_OPENAI_API_KEY"):
-        return PGVector(
-            connection_string=PG_CONNECTION_STRING,
-            embedding_function=AzureOpenAIEmbeddings(
-                azure_endpoint=os.environ.get("AZURE_OPENAI_API_BASE"),
-                azure_deployment=os.environ.get(
-                    "AZURE_OPENAI_EMBEDDINGS_DEPLOYMENT_NAME"
-                ),
-                openai_api_version=os.environ.get("AZURE_OPENAI_API_VERSION"),
-            ),
-            use_jsonb=True,
-            collection_name=_collection_name(),
-        )
-    raise ValueError(
-        "Set EMBEDDINGS_PROVIDER=local with EMBEDDINGS_URL, or configure OPENAI_API_KEY/AZURE_OPENAI_API_KEY."
+    return BatchedPGVector(
+        connection_string=PG_CONNECTION_STRING,
+        connection=PG_ENGINE,
+        embedding_function=get_embeddings_client(),
+        use_jsonb=True,
+        collection_name=_collection_name(),
+        embedding_storage=EMBEDDINGS_CONFIG.storage,
     )
 
 
@@ -164,14 +394,18 @@ class IngestRunnable(RunnableSerializable[BinaryIO, List[str]]):
         progress_callback: Optional[Callable[[int], None]] = None,
         should_cancel: Optional[Callable[[], bool]] = None,
     ) -> List[str]:
+        # The mimetype is known from upload, so go straight to its parser. The
+        # registry is only used to report missing or unsupported mimetypes.
+        parser = HANDLERS.get(blob.mimetype, MIMETYPE_BASED_PARSER)
+        batch_size, max_batch_chars = _ingest_batch_limits()
         out = ingest_blob(
             blob,
-            MIMETYPE_BASED_PARSER,
+            parser,
             self.text_splitter,
             self.vectorstore,
             self.namespace,
-            batch_size=5,
-            max_batch_chars=50_000,
+            batch_size=batch_size,
+            max_batch_chars=max_batch_chars,
             progress_callback=progress_callback,
             should_cancel=should_cancel,
         )
@@ -186,11 +420,19 @@ PG_CONNECTION_STRING = PGVector.connection_string_from_db_params(
     user=os.environ["POSTGRES_USER"],
     password=os.environ["POSTGRES_PASSWORD"],
 )
+# One pooled engine for all vector store traffic, so ingest batches and memory
+# writes reuse connections instead of opening one per request.
+PG_ENGINE = sqlalchemy.create_engine(
+    PG_CONNECTION_STRING,
+    pool_size=16,
+    max_overflow=32,
+    pool_pre_ping=True,
+)
 vstore = _determine_embeddings()
 
 
 ingest_runnable = IngestRunnable(
-    text_splitter=RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200),
+    text_splitter=default_text_splitter(),
     vectorstore=vstore,
 ).configurable_fields(
     assistant_id=ConfigurableField(
@@ -0,0 +1 @@
+DROP TABLE IF EXISTS ingest_job;
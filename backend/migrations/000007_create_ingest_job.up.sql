@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS ingest_job (
+    job_id TEXT PRIMARY KEY,
+    status VARCHAR(16) NOT NULL DEFAULT 'running',
+    progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+    error TEXT,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    processed_bytes BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_job_updated_at ON ingest_job (updated_at);
@@ -0,0 +1,2 @@
+ALTER TABLE "user"
+    ADD COLUMN IF NOT EXISTS tokens_not_before TIMESTAMP WITH TIME ZONE;
@@ -22,29 +22,35 @@ def test_list_of_supported_mimetypes() -> None:
     ]
 
 
-def test_attempt_to_parse_each_fixture() -> None:
-    """Attempt to parse supported fixtures."""
-    seen_mimetypes = set()
-    for path in get_sample_paths():
-        type_, _ = mimetypes.guess_type(path)
-        if type_ not in SUPPORTED_MIMETYPES:
-            continue
-        seen_mimetypes.add(type_)
-        blob = Blob.from_path(path)
-        try:
-            documents = MIMETYPE_BASED_PARSER.parse(blob)
-        except urllib.error.HTTPError as exc:
-            if exc.code == 403:
-                pytest.skip("NLTK data download blocked in this environment.")
-            raise
-        try:
-            assert len(documents) == 1
-            doc = documents[0]
-            assert "source" in doc.metadata
-            assert doc.metadata["source"] == str(path)
-            assert "🦜" in doc.page_content
-        except Exception as e:
-            raise AssertionError(f"Failed to parse {path}") from e
+PARSEABLE_FIXTURES = [
+    path
+    for path in sorted(get_sample_paths())
+    if mimetypes.guess_type(path)[0] in SUPPORTED_MIMETYPES
+]
 
+
+def test_fixtures_cover_supported_mimetypes() -> None:
+    """Every supported mimetype, bar known gaps, has a fixture to parse."""
+    seen_mimetypes = {mimetypes.guess_type(path)[0] for path in PARSEABLE_FIXTURES}
     known_missing = {"application/msword"}
     assert set(SUPPORTED_MIMETYPES) - known_missing == seen_mimetypes
+
+
+@pytest.mark.parametrize("path", PARSEABLE_FIXTURES, ids=lambda path: path.name)
+def test_attempt_to_parse_each_fixture(path) -> None:
+    """Attempt to parse a supported fixture."""
+    blob = Blob.from_path(path)
+    try:
+        documents = MIMETYPE_BASED_PARSER.parse(blob)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 403:
+            pytest.skip("NLTK data download blocked in this environment.")
+        raise
+    try:
+        assert len(documents) == 1
+        doc = documents[0]
+        assert "source" in doc.metadata
+        assert doc.metadata["source"] == str(path)
+        assert "🦜" in doc.page_content
+    except Exception as e:
+        raise AssertionError(f"Failed to parse {path}") from e
@@ -0,0 +1,37 @@
+import pytest
+
+from app.splitters import (
+    SemanticTextSplitter,
+    default_text_splitter,
+    merge_small_chunks,
+)
+
+
+def test_merge_small_chunks() -> None:
+    """Neighbouring chunks are merged by span, without repeating overlaps."""
+    text = "alpha beta gamma delta"
+    chunks = ["alpha beta", "beta gamma", "delta"]
+    assert merge_small_chunks(text, chunks, max_size=100) == [text]
+
+
+def test_merge_small_chunks_keeps_full_chunks() -> None:
+    """Chunks that would grow past max_size stay apart unless one is tiny."""
+    first, second, tail = "a" * 150, "b" * 150, "c" * 10
+    text = f"{first} {second} {tail}"
+    chunks = [first, second, tail]
+    assert merge_small_chunks(text, chunks, max_size=200, min_size=20) == [
+        first,
+        f"{second} {tail}",
+    ]
+
+
+def test_semantic_text_splitter() -> None:
+    """The Rust splitter is the default and keeps chunks within chunk_size."""
+    pytest.importorskip("semantic_text_splitter")
+    assert isinstance(default_text_splitter(), SemanticTextSplitter)
+    text = "\n\n".join(f"Paragraph {i}. " + "Some words here. " * 20 for i in range(20))
+    splitter = SemanticTextSplitter(chunk_size=500, chunk_overlap=50)
+    chunks = splitter.split_text(text)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 * 1.15 for chunk in chunks)
+    assert all(chunk in text for chunk in chunks)
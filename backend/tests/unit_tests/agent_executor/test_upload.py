@@ -8,7 +8,7 @@ from tests.unit_tests.fixtures import get_sample_paths
 from tests.unit_tests.utils import InMemoryVectorStore
 
 
-def test_ingestion_runnable() -> None:
+async def test_ingestion_runnable() -> None:
     """Test ingestion runnable"""
     vectorstore = InMemoryVectorStore()
     splitter = RecursiveCharacterTextSplitter()
@@ -25,11 +25,33 @@ def test_ingestion_runnable() -> None:
     file = UploadFile(filename="testfile.txt", file=file_data)
 
     # Convert the file to blob
-    blob, _ = convert_ingestion_input_to_blob(file)
+    blob, _ = await convert_ingestion_input_to_blob(file)
     ids = runnable.invoke(blob)
     assert len(ids) == 1
 
 
+async def test_ingestion_skips_repeated_chunks() -> None:
+    """Identical chunks of one file are indexed once."""
+    vectorstore = InMemoryVectorStore()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=0)
+    runnable = IngestRunnable(
+        text_splitter=splitter,
+        vectorstore=vectorstore,
+        assistant_id="TheParrot",
+    )
+    file = UploadFile(
+        filename="testfile.txt", file=BytesIO(b"repeat me\n\nrepeat me\n\nother")
+    )
+
+    blob, _ = await convert_ingestion_input_to_blob(file)
+    ids = runnable.invoke(blob)
+    assert len(ids) == 2
+    assert {doc.page_content for doc in vectorstore.store.values()} == {
+        "repeat me",
+        "other",
+    }
+
+
 def test_mimetype_guessing() -> None:
     """Verify mimetype guessing for all fixtures."""
     name_to_mime = {}
@@ -48,3 +70,13 @@ def test_mimetype_guessing() -> None:
         "sample.rtf": "application/rtf",
         "sample.txt": "text/plain",
     } == name_to_mime
+
+
+def test_mimetype_sniffing_without_extension() -> None:
+    """Verify content sniffing for files without a known extension."""
+    assert _guess_mimetype("data", b"a,b\n1,2\n") == "text/csv"
+    assert _guess_mimetype("data", b"a\tb\n1\t2\n") == "text/csv"
+    assert _guess_mimetype("notes", b"first line\nsecond line\n") == "text/plain"
+    assert _guess_mimetype("notes", "café au lait".encode()) == "text/plain"
+    assert _guess_mimetype("empty", b"") == "text/plain"
+    assert _guess_mimetype("blob", b"\x00\x01\x02") == "application/octet-stream"
@@ -134,3 +134,72 @@ async def test_threads(pool: asyncpg.pool.Pool) -> None:
             headers={"Cookie": "opengpts_user_id=2"},
         )
         assert response.status_code == 422
+
+
+async def test_memory_pages_past_rows_without_created_at(
+    pool: asyncpg.pool.Pool,
+) -> None:
+    """A page that ends on a memory without created_at still has a next page."""
+    from app.memory import MEMORY_SOURCE
+    from app.upload import _collection_name
+
+    headers = {"Cookie": "opengpts_user_id=1"}
+    async with get_client() as client:
+        response = await client.get("/memory", headers=headers)
+        assert response.status_code == 200
+        assert response.json() == {"items": [], "next_cursor": None}
+
+    collection_id = str(uuid4())
+    undated = sorted((str(uuid4()) for _ in range(3)), reverse=True)
+    dated = [
+        (str(uuid4()), "2024-01-02T00:00:00+00:00"),
+        (str(uuid4()), "2024-01-01T00:00:00+00:00"),
+    ]
+    async with pool.acquire() as conn:
+        # langchain_pg_* are created by PGVector rather than by migrations.
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS langchain_pg_collection (
+                uuid UUID PRIMARY KEY, name VARCHAR NOT NULL, cmetadata JSON
+            );
+            CREATE TABLE IF NOT EXISTS langchain_pg_embedding (
+                uuid UUID PRIMARY KEY,
+                collection_id UUID,
+                document VARCHAR,
+                cmetadata JSONB
+            );
+            """
+        )
+        user_id = str(
+            await conn.fetchval('SELECT user_id FROM "user" WHERE sub = $1', "1")
+        )
+        await conn.execute(
+            "INSERT INTO langchain_pg_collection (uuid, name) VALUES ($1, $2)",
+            collection_id,
+            _collection_name(),
+        )
+        base = {"source": MEMORY_SOURCE, "user_id": user_id}
+        rows = [(memory_id, base) for memory_id in undated] + [
+            (memory_id, {**base, "created_at": created_at})
+            for memory_id, created_at in dated
+        ]
+        await conn.executemany(
+            "INSERT INTO langchain_pg_embedding "
+            "(uuid, collection_id, document, cmetadata) VALUES ($1, $2, $3, $4)",
+            [(memory_id, collection_id, "hi", meta) for memory_id, meta in rows],
+        )
+
+    listed = []
+    cursor = None
+    async with get_client() as client:
+        for _ in range(4):
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = await client.get("/memory", params=params, headers=headers)
+            assert response.status_code == 200, response.text
+            page = response.json()
+            listed.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+    assert listed == undated + [memory_id for memory_id, _ in dated]
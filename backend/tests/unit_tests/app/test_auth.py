@@ -5,7 +5,13 @@ from unittest.mock import MagicMock, patch
 
 import jwt
 
-from app.auth.handlers import AuthedUser, get_auth_handler
+import app.storage as storage
+from app.api.auth import (
+    REFRESH_COOKIE_NAME,
+    _issue_access_token,
+    _issue_refresh_token,
+)
+from app.auth.handlers import AuthedUser, get_auth_handler, purge_user
 from app.auth.settings import (
     AuthType,
     JWTSettingsLocal,
@@ -74,6 +80,101 @@ async def test_jwt_local():
         assert response.status_code == 401
 
 
+async def test_jwt_local_token_cache():
+    get_auth_handler.cache_clear()
+    auth_settings.auth_type = AuthType.JWT_LOCAL
+    key = "key"
+    auth_settings.jwt_local = JWTSettingsLocal(
+        alg="HS256",
+        iss="issuer",
+        aud="audience",
+        decode_key_b64=b64encode(key.encode("utf-8")),
+    )
+    sub = "user_jwt_local_cached"
+
+    token = _create_jwt(
+        key=key,
+        alg=auth_settings.jwt_local.alg,
+        payload={
+            "sub": sub,
+            "iss": auth_settings.jwt_local.iss,
+            "aud": auth_settings.jwt_local.aud,
+            "exp": datetime.now(timezone.utc) + timedelta(days=1),
+        },
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with patch(
+        "app.auth.handlers.storage.get_or_create_user",
+        wraps=storage.get_or_create_user,
+    ) as get_or_create_user:
+        async with get_client() as client:
+            for _ in range(2):
+                response = await client.get("/me", headers=headers)
+                assert response.status_code == 200
+                assert response.json()["sub"] == sub
+            assert get_or_create_user.call_count == 1
+
+            purge_user(sub)
+            response = await client.get("/me", headers=headers)
+            assert response.status_code == 200
+            assert get_or_create_user.call_count == 2
+
+
+async def test_jwt_local_logout_revokes_tokens():
+    """Tokens issued before a logout are rejected, later ones are not."""
+    get_auth_handler.cache_clear()
+    auth_settings.auth_type = AuthType.JWT_LOCAL
+    auth_settings.jwt_local = JWTSettingsLocal(
+        alg="HS256",
+        iss="issuer",
+        aud="audience",
+        decode_key_b64=b64encode(("k" * 32).encode("utf-8")),
+    )
+    sub = "user_jwt_local_logout"
+    headers = {"Authorization": f"Bearer {_issue_access_token(sub)}"}
+    refresh_cookie = {"Cookie": f"{REFRESH_COOKIE_NAME}={_issue_refresh_token(sub)}"}
+
+    async with get_client() as client:
+        response = await client.get("/me", headers=headers)
+        assert response.status_code == 200
+
+        response = await client.post("/logout", headers=refresh_cookie)
+        assert response.status_code == 200
+
+        response = await client.get("/me", headers=headers)
+        assert response.status_code == 401
+        response = await client.post("/refresh", headers=refresh_cookie)
+        assert response.status_code == 401
+
+        new_headers = {"Authorization": f"Bearer {_issue_access_token(sub)}"}
+        response = await client.get("/me", headers=new_headers)
+        assert response.status_code == 200
+
+
+def test_issue_tokens_decode_with_pyjwt():
+    """Hand-assembled HS256 tokens must be accepted by PyJWT."""
+    auth_settings.jwt_local = JWTSettingsLocal(
+        alg="HS256",
+        iss="issuer",
+        aud="audience",
+        decode_key_b64=b64encode(("k" * 32).encode("utf-8")),
+    )
+    for issue, token_use in (
+        (_issue_access_token, "access"),
+        (_issue_refresh_token, "refresh"),
+    ):
+        payload = jwt.decode(
+            issue("user_issue"),
+            "k" * 32,
+            issuer="issuer",
+            audience="audience",
+            algorithms=["HS256"],
+        )
+        assert payload["sub"] == "user_issue"
+        assert payload["token_use"] == token_use
+
+
 async def test_jwt_oidc():
     get_auth_handler.cache_clear()
     auth_settings.auth_type = AuthType.JWT_OIDC
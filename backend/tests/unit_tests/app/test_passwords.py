@@ -0,0 +1,86 @@
+import base64
+import hashlib
+
+import pytest
+
+from app.auth.passwords import (
+    ahash_password,
+    averify_password,
+    hash_password,
+    hash_passwords_bulk,
+    needs_rehash,
+    validate_password,
+    verify_password,
+)
+
+
+def _legacy_pbkdf2_hash(password: str, salt: bytes, iterations: int = 1_000) -> str:
+    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    encoded_salt = base64.b64encode(salt).decode("ascii")
+    encoded_hash = base64.b64encode(dk).decode("ascii")
+    return f"pbkdf2_sha256${iterations}${encoded_salt}${encoded_hash}"
+
+
+def _flip_char(value: str, index: int) -> str:
+    replacement = "A" if value[index] != "A" else "B"
+    return value[:index] + replacement + value[index + 1 :]
+
+
+def test_verify_password_argon2() -> None:
+    stored = hash_password("correct horse 1!")
+    assert verify_password("correct horse 1!", stored)
+    assert not verify_password("correct horse 2!", stored)
+    assert not needs_rehash(stored)
+
+
+def test_verify_password_rejects_tampered_hash() -> None:
+    """Hashes differing early or late in the digest are both rejected."""
+    password = "correct horse 1!"
+    for stored in (
+        hash_password(password),
+        _legacy_pbkdf2_hash(password, b"0123456789abcdef"),
+    ):
+        digest_start = stored.rindex("$") + 1
+        assert not verify_password(password, _flip_char(stored, digest_start))
+        assert not verify_password(password, _flip_char(stored, len(stored) - 4))
+
+
+def test_verify_password_legacy_pbkdf2() -> None:
+    stored = _legacy_pbkdf2_hash("correct horse 1!", b"0123456789abcdef")
+    assert verify_password("correct horse 1!", stored)
+    assert not verify_password("correct horse 2!", stored)
+    assert needs_rehash(stored)
+
+
+def test_verify_password_malformed_hash() -> None:
+    assert not verify_password("anything", "")
+    assert not verify_password("anything", "not-a-hash")
+    assert not verify_password("anything", "pbkdf2_sha256$x$y")
+
+
+async def test_async_password_helpers() -> None:
+    stored = await ahash_password("correct horse 1!")
+    assert await averify_password("correct horse 1!", stored)
+    assert not await averify_password("correct horse 2!", stored)
+
+
+def test_hash_passwords_bulk_keeps_order() -> None:
+    passwords = [f"correct horse {i}!" for i in range(4)]
+    hashes = hash_passwords_bulk(passwords)
+    assert len(hashes) == len(passwords)
+    for password, stored in zip(passwords, hashes):
+        assert verify_password(password, stored)
+
+
+def test_validate_password() -> None:
+    validate_password("correct horse 1!")
+    validate_password("ünïcödé pässwörd 1")
+    for password, message in (
+        ("short 1!", "at least"),
+        ("1234567890!", "letter"),
+        ("correct horse!", "number"),
+        ("correcthorse1", "special"),
+        ("ünïcödépässwörd1", "special"),
+    ):
+        with pytest.raises(ValueError, match=message):
+            validate_password(password)
@@ -0,0 +1,24 @@
+import pytest
+from fastapi import HTTPException
+
+from app.auth.rate_limit import SlidingWindowLimiter
+
+
+def test_sliding_window_limiter() -> None:
+    limiter = SlidingWindowLimiter(limit=2, window=60)
+    assert limiter.hit("a") is None
+    assert limiter.hit("a") is None
+    retry_after = limiter.hit("a")
+    assert retry_after is not None and 0 < retry_after <= 60
+    # Keys are limited independently.
+    assert limiter.hit("b") is None
+
+
+def test_sliding_window_limiter_check() -> None:
+    limiter = SlidingWindowLimiter(limit=1, window=60)
+    limiter.check("127.0.0.1", "login", "user")
+    limiter.check("127.0.0.1", "login", "other-user")
+    with pytest.raises(HTTPException) as exc_info:
+        limiter.check("127.0.0.1", "login", "user")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "60"
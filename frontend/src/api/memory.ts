@@ -1,11 +1,15 @@
-import { MemoryItem } from "../types";
+import { MemoryPage } from "../types";
 import { authFetch } from "../utils/authFetch";
 
 export async function listMemory(
   limit = 200,
-  offset = 0,
-): Promise<MemoryItem[]> {
-  const response = await authFetch(`/memory?limit=${limit}&offset=${offset}`, {
+  cursor?: string | null,
+): Promise<MemoryPage> {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) {
+    params.set("cursor", cursor);
+  }
+  const response = await authFetch(`/memory?${params}`, {
     headers: {
       Accept: "application/json",
     },
@@ -13,7 +17,7 @@ export async function listMemory(
   if (!response.ok) {
     throw new Error("Failed to load memory.");
   }
-  return (await response.json()) as MemoryItem[];
+  return (await response.json()) as MemoryPage;
 }
 
 export async function deleteMemory(id: string): Promise<boolean> {
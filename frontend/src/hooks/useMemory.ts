@@ -12,7 +12,7 @@ export function useMemory() {
     setError(null);
     try {
       const data = await listMemory();
-      setItems(data);
+      setItems(data.items);
     } catch (err) {
       setError(err instanceof Error ? err.message : "Failed to load memory.");
     } finally {
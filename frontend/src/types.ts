@@ -47,3 +47,8 @@ export interface MemoryItem {
   thread_id: string | null;
   assistant_id: string | null;
 }
+
+export interface MemoryPage {
+  items: MemoryItem[];
+  next_cursor: string | null;
+}